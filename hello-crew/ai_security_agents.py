@@ -1,21 +1,32 @@
 # personas.py
 
 from crewai import Agent
-from langchain_openai import ChatOpenAI
-from duckduckgo_search import ddg  # Import DuckDuckGo search library
-
-# Setup for the LLM
-llm = ChatOpenAI(
-    model="llama3.1:8b-instruct-q8_0",
-    base_url="http://localhost:11434/v1",
-    openai_api_key='NA'
-)
+from llm_client import get_llm as get_pooled_llm
+from registry import LazyRegistry
+from retrieval import retrieval_tools
+from search import get_search_client, search_tools, search_topic
+
+MODEL = "llama3.1:8b-instruct-q8_0"
+
+
+def build_llm(**overrides):
+    """Returns the research model client from the shared pool; overrides such as streaming=True build a new one."""
+    return get_pooled_llm(MODEL, **overrides)
+
+# Agents and the shared LLM are built on first use, so importing this module stays cheap
+_registry = LazyRegistry()
+_registry.register("llm", build_llm)
+
+
+def get_llm():
+    """Returns the shared research LLM client, building it on first use."""
+    return _registry.get("llm")
 
 # Define Agents with Search Capabilities
 class WritingAgents:
     # Researcher Agent with DuckDuckGo Search Integration
     class Researcher(Agent):
-        def __init__(self):
+        def __init__(self, llm=None):
             super().__init__(
                 role="Researcher",
                 goal="Create a comprehensive research summary based on the provided topic using live search data.",
@@ -24,72 +35,82 @@ class WritingAgents:
                     "Your goal is to gather up-to-date information from the web using DuckDuckGo search and synthesize it "
                     "into a concise research summary."
                 ),
+                # Web search through the shared, cached search client, then the local documents
+                tools=search_tools() + retrieval_tools(),
                 allow_delegation=False,
                 verbose=True,
-                llm=llm
+                llm=llm if llm is not None else get_llm()
             )
 
         # Custom search function
         def perform_search(self, query, max_results=5):
-            """Uses DuckDuckGo to perform a live search and return results."""
-            search_results = ddg(query, max_results=max_results)
-            return search_results
+            """Searches through the shared, cached search client and returns results."""
+            return get_search_client().search_many([query], max_results=max_results)
 
         # Custom task execution to gather data and summarize
         def execute(self, task_description, inputs):
-            """Override the default execute function to perform live search."""
+            """Summarizes live search results for the topic without running the agent."""
             topic = inputs.get("topic", "")
             if not topic:
                 return "No topic provided."
+            return search_topic(topic)
 
-            # Perform the search and collect results
-            search_query = f"{topic} site:scholar.google.com OR site:arxiv.org OR site:researchgate.net"
-            search_results = self.perform_search(search_query)
 
-            # Summarize the results
-            research_summary = f"Research Summary for Topic: {topic}\n\n"
-            for idx, result in enumerate(search_results):
-                research_summary += f"{idx + 1}. Title: {result['title']}\n"
-                research_summary += f"URL: {result['href']}\n"
-                research_summary += f"Snippet: {result.get('body', 'No snippet available')}\n\n"
-
-            return research_summary
-
-    researcher = Researcher()
-
-    # SME and Outliner Agents
-    sme_1 = Agent(
+# SME, Outliner and Topic Parser agent definitions
+AGENT_SPECS = dict(
+    sme_1=dict(
         role="Subject Matter Expert 1",
         goal="Review the research summary and provide technical insights.",
         backstory=(
             "You are a subject matter expert specializing in AI Security. "
             "Your goal is to validate the research summary, ensuring it is accurate and complete."
         ),
-        allow_delegation=False,
-        verbose=True,
-        llm=llm
-    )
+    ),
 
-    sme_2 = Agent(
+    sme_2=dict(
         role="Subject Matter Expert 2",
         goal="Provide additional context and refine technical details in the research summary.",
         backstory=(
             "You are a secondary subject matter expert focused on adding depth to the research summary. "
             "Your goal is to highlight any missing elements and refine the technical content."
         ),
-        allow_delegation=False,
-        verbose=True,
-        llm=llm
-    )
+    ),
 
-    outliner = Agent(
+    outliner=dict(
         role="Outliner",
         goal="Transform the research summary and SME inputs into a structured outline.",
         backstory=(
             "You are responsible for creating a clear and structured outline based on the research summary "
             "and SME feedback. Your outline should serve as a blueprint for abstract generation."
         ),
+    ),
+
+    topic_parser=dict(
+        role="Topic Parser",
+        goal="Extract the key topics, focus areas, and main messages from the seed abstract.",
+        backstory=(
+            "You are an analyst who breaks abstracts down into their core topics and themes. "
+            "Your goal is to give the research team a clear, structured starting point."
+        ),
+    ),
+)
+
+
+def build_agent(name, llm=None):
+    """Builds a fresh instance of the named agent ("researcher" or a key of AGENT_SPECS)."""
+    if name == "researcher":
+        return WritingAgents.Researcher(llm=llm)
+    return Agent(
+        **AGENT_SPECS[name],
+        tools=retrieval_tools(),
         allow_delegation=False,
         verbose=True,
-        llm=llm
+        llm=llm if llm is not None else get_llm()
     )
+
+
+# Register the default agents; `from ai_security_agents import sme_1` builds them lazily
+for _name in ["researcher", *AGENT_SPECS]:
+    _registry.register(_name, lambda name=_name: build_agent(name))
+
+__getattr__ = _registry.module_getattr(__name__)
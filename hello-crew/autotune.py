@@ -0,0 +1,257 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import httpx
+
+from context_budget import build_context
+from llm_client import DEFAULT_BASE_URL, DEFAULT_TUNING_PATH, MOCK_TUNING_PATH
+from rsac_tasks import TITLE_ABSTRACT_TASK
+from util import percentile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Thread variables the old optimize-ollama.sh exported; --bashrc removes them, since thread counts
+# now live in per-model variants
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "NUMEXPR_NUM_THREADS", "NUMEXPR_MAX_THREADS")
+
+
+def representative_prompt(seed_file=os.path.join(HERE, "rsac_seed.txt")):
+    """The first RSA task's instructions and context, as the pipeline sends them."""
+    with open(seed_file, "r") as file:
+        seed_abstract = file.read().strip()
+    context = build_context(TITLE_ABSTRACT_TASK, {}, {"abstract": seed_abstract,
+                                                      "mission": "Create a compelling RSA Conference abstract."})
+    return (f"{TITLE_ABSTRACT_TASK['description']}\n\n{TITLE_ABSTRACT_TASK['expected_output']}\n\n"
+            f"This is the context you're working with:\n{context}")
+
+
+class Endpoint:
+    """Sends one chat completion and returns its completion token count.
+
+    The "openai" API is any OpenAI-compatible server (Ollama's /v1, the mock
+    server). The "ollama" API is Ollama's native /api/chat, which also takes
+    a per-request num_thread, so only it can sweep thread counts.
+    """
+
+    def __init__(self, base_url, model, api="openai", max_tokens=128, timeout=600):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.api = api
+        self.max_tokens = max_tokens
+        self.client = httpx.Client(timeout=timeout, limits=httpx.Limits(max_connections=64))
+
+    def _native_url(self, path):
+        # Native API lives beside the OpenAI-compatible one: http://host:11434/v1 -> http://host:11434
+        root = self.base_url[:-3] if self.base_url.endswith("/v1") else self.base_url
+        return f"{root}{path}"
+
+    def complete(self, prompt, num_thread=None):
+        messages = [{"role": "user", "content": prompt}]
+        if self.api == "ollama":
+            options = {"num_predict": self.max_tokens, "temperature": 0}
+            if num_thread:
+                options["num_thread"] = num_thread
+            response = self.client.post(self._native_url("/api/chat"), json={"model": self.model, "messages": messages,
+                                                                   "stream": False, "options": options})
+            response.raise_for_status()
+            return response.json().get("eval_count", 0)
+        response = self.client.post(f"{self.base_url}/chat/completions", json={
+            "model": self.model, "messages": messages, "max_tokens": self.max_tokens, "temperature": 0,
+        })
+        response.raise_for_status()
+        return (response.json().get("usage") or {}).get("completion_tokens", 0)
+
+    def create_variant(self, num_thread):
+        """Creates an Ollama model that is this one with num_thread baked in; returns its name.
+
+        The OpenAI-compatible API the pipelines use has no per-request
+        num_thread, so the pipelines send this model's requests to the
+        variant instead (see llm_client.PooledTransport).
+        """
+        variant = f"{self.model}-t{num_thread}"
+        response = self.client.post(self._native_url("/api/create"), json={
+            "model": variant, "from": self.model, "parameters": {"num_thread": num_thread}, "stream": False,
+        })
+        response.raise_for_status()
+        return variant
+
+    def close(self):
+        self.client.close()
+
+
+def measure(endpoint, prompt, parallel, requests, num_thread=None):
+    """Runs `requests` completions with `parallel` in flight; returns throughput and latency figures."""
+    def one(_):
+        started = time.monotonic()
+        tokens = endpoint.complete(prompt, num_thread)
+        return tokens, time.monotonic() - started
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=parallel) as pool:
+        results = list(pool.map(one, range(requests)))
+    wall = time.monotonic() - started
+    latencies = [latency for _, latency in results]
+    tokens = sum(count for count, _ in results)
+    return {
+        "num_thread": num_thread,
+        "parallel": parallel,
+        "requests": requests,
+        "completion_tokens": tokens,
+        "wall_seconds": round(wall, 3),
+        "tokens_per_second": round(tokens / wall, 2) if wall > 0 else 0.0,
+        "p50_latency": round(percentile(latencies, 0.5), 3),
+        "p95_latency": round(percentile(latencies, 0.95), 3),
+    }
+
+
+def pick_best(results, max_p95=None, tolerance=0.05):
+    """Highest throughput within the p95 budget; near-ties (within `tolerance`) go to the lowest p95."""
+    eligible = [result for result in results if max_p95 is None or result["p95_latency"] <= max_p95] or results
+    best_rate = max(result["tokens_per_second"] for result in eligible)
+    close = [result for result in eligible if result["tokens_per_second"] >= best_rate * (1 - tolerance)]
+    return min(close, key=lambda result: (result["p95_latency"], result["parallel"]))
+
+
+def sweep(endpoint, prompt, threads, parallels, requests_per_slot=2, echo=print):
+    """Measures every (threads, parallelism) pair after one warm-up request that loads the model."""
+    endpoint.complete(prompt)
+    results = []
+    for num_thread in threads:
+        for parallel in parallels:
+            result = measure(endpoint, prompt, parallel, max(parallel * requests_per_slot, 2), num_thread)
+            results.append(result)
+            echo(f"threads {num_thread or '-':>3}  parallel {parallel:>2}  "
+                 f"{result['tokens_per_second']:8.1f} tok/s  p95 {result['p95_latency']:6.2f}s")
+    return results
+
+
+def load_tuning(path):
+    try:
+        with open(path, "r") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {"models": {}}
+
+
+def write_tuning(path, base_url, model, best, results, variant=None):
+    """Merges the chosen settings for `model` into the tuning file the pipelines read.
+
+    The pipelines cap `model` at max_concurrency and, when a num_thread
+    `variant` was created, send its requests to the variant.
+    """
+    tuning = load_tuning(path)
+    tuning["base_url"] = base_url
+    tuning.setdefault("models", {})[model] = {
+        "max_concurrency": best["parallel"],
+        "num_thread": best["num_thread"],
+        "variant": variant,
+        "tokens_per_second": best["tokens_per_second"],
+        "p95_latency": best["p95_latency"],
+        "tuned_at": datetime.now().isoformat(timespec="seconds"),
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as file:
+        json.dump(tuning, file, indent=2)
+
+
+def update_bashrc(parallel, path=os.path.expanduser("~/.bashrc")):
+    """Replaces the parallelism export in ~/.bashrc and drops the thread exports optimize-ollama.sh wrote.
+
+    OLLAMA_NUM_PARALLEL applies to the whole server, so it gets one value.
+    """
+    exports = {"OLLAMA_NUM_PARALLEL": parallel}
+    replaced = THREAD_ENV_VARS + tuple(exports)
+    lines = []
+    if os.path.exists(path):
+        with open(path, "r") as file:
+            lines = [line for line in file if not any(line.startswith(f"export {name}=") for name in replaced)]
+    lines.extend(f"export {name}={value}\n" for name, value in exports.items())
+    with open(path, "w") as file:
+        file.writelines(lines)
+    return exports
+
+
+def _int_list(text):
+    return [int(value) for value in text.split(",") if value.strip()]
+
+
+def default_threads():
+    cores = os.cpu_count() or 4
+    return sorted({max(1, cores * share // 4) for share in (1, 2, 3, 4)})
+
+
+def main(argv=None):
+    from cascade import TIERS
+
+    parser = argparse.ArgumentParser(description="Measure inference throughput and pick thread and parallelism settings.")
+    parser.add_argument("--base-url", default=os.environ.get("LLM_BASE_URL", DEFAULT_BASE_URL),
+                        help="OpenAI-compatible endpoint (default: LLM_BASE_URL or Ollama on localhost).")
+    parser.add_argument("--api", choices=["openai", "ollama"], default="openai",
+                        help="Request API; only 'ollama' (native /api/chat) can sweep thread counts.")
+    parser.add_argument("--model", action="append",
+                        help="Model to tune; repeatable (default: every cascade tier).")
+    parser.add_argument("--mock", action="store_true", help="Tune against a local mock server instead.")
+    parser.add_argument("--threads", type=_int_list,
+                        help="Comma-separated num_thread values (default with --api ollama: quarters of the cores).")
+    parser.add_argument("--parallel", type=_int_list, default=[1, 2, 4], help="Comma-separated parallelism levels.")
+    parser.add_argument("--requests-per-slot", type=int, default=2, help="Requests per parallel slot per setting.")
+    parser.add_argument("--max-tokens", type=int, default=128, help="Completion tokens per request.")
+    parser.add_argument("--max-p95", type=float, help="Latency budget in seconds; settings above it are skipped.")
+    parser.add_argument("--output",
+                        help="Tuning file to update (default: LLM_TUNING_FILE or llm_tuning.json; "
+                             "llm_tuning.mock.json with --mock).")
+    parser.add_argument("--bashrc", action="store_true",
+                        help="Also export OLLAMA_NUM_PARALLEL in ~/.bashrc: the highest parallelism chosen "
+                             "for any model, since the server applies it to every model.")
+    args = parser.parse_args(argv)
+
+    if args.api != "ollama" and args.threads:
+        parser.error("--threads needs --api ollama; the OpenAI-compatible API has no per-request thread count")
+    threads = args.threads or (default_threads() if args.api == "ollama" else [None])
+    if args.mock and args.bashrc:
+        parser.error("--bashrc would export settings measured on the mock server; drop --mock")
+    if args.output is None:
+        # Mock results must never reach the file the real pipelines read
+        args.output = MOCK_TUNING_PATH if args.mock else os.environ.get("LLM_TUNING_FILE", DEFAULT_TUNING_PATH)
+
+    server = None
+    base_url = args.base_url
+    if args.mock:
+        from mock_server import MockOpenAIServer
+        server = MockOpenAIServer().start()
+        base_url = server.url
+
+    prompt = representative_prompt()
+    parallels = []
+    try:
+        for model in args.model or list(TIERS.values()):
+            print(f"Tuning {model} at {base_url}")
+            endpoint = Endpoint(base_url, model, api=args.api, max_tokens=args.max_tokens)
+            try:
+                results = sweep(endpoint, prompt, threads, args.parallel, args.requests_per_slot)
+                best = pick_best(results, args.max_p95)
+                variant = endpoint.create_variant(best["num_thread"]) if best["num_thread"] else None
+            finally:
+                endpoint.close()
+            write_tuning(args.output, base_url, model, best, results, variant)
+            parallels.append(best["parallel"])
+            print(f"Best for {model}: threads {best['num_thread'] or 'unchanged'}, parallel {best['parallel']} "
+                  f"({best['tokens_per_second']} tok/s, p95 {best['p95_latency']}s)"
+                  + (f"; pipelines will use {variant}" if variant else ""))
+        if args.bashrc:
+            exports = update_bashrc(max(parallels))
+            print("Updated ~/.bashrc: " + ", ".join(f"{name}={value}" for name, value in exports.items()))
+    finally:
+        if server is not None:
+            server.stop()
+    print(f"Settings written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,263 @@
+import argparse
+import contextlib
+import json
+import os
+import resource
+import subprocess
+import threading
+import time
+
+from context_budget import estimate_tokens
+from mock_server import MockOpenAIServer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PIPELINES = ("rsac", "outline")
+
+
+def _callback_handler_class():
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class LLMCallTimer(BaseCallbackHandler):
+        """Attributes every LLM call's duration and token counts to the task running on its thread."""
+
+        def __init__(self, task_names):
+            self.tasks = [
+                {"name": name, "llm_calls": 0, "llm_seconds": 0.0, "prompt_tokens": 0, "completion_tokens": 0}
+                for name in task_names
+            ]
+            self.index = 0
+            self._by_name = {task["name"]: task for task in self.tasks}
+            self._started = {}
+            self._calls = {}
+            self._lock = threading.Lock()
+            self._local = threading.local()
+
+        def begin(self, name):
+            """Starts timing a task on the calling thread."""
+            self._local.task = self._by_name[name]
+            self._started[name] = time.monotonic()
+
+        def finish(self, name, output=None):
+            self._by_name[name]["wall_seconds"] = time.monotonic() - self._started[name]
+
+        def start(self):
+            self.begin(self.tasks[0]["name"])
+
+        def task_done(self, output):
+            """Sequential task callback: closes the running task and starts timing the next one."""
+            self.finish(self.tasks[self.index]["name"])
+            self.index += 1
+            if self.index < len(self.tasks):
+                self.begin(self.tasks[self.index]["name"])
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+            prompt = "".join(str(message.content) for batch in messages for message in batch)
+            self._calls[run_id] = (time.monotonic(), estimate_tokens(prompt))
+
+        def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+            self._calls[run_id] = (time.monotonic(), estimate_tokens("".join(prompts)))
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            started, estimated_prompt_tokens = self._calls.pop(run_id, (time.monotonic(), 0))
+            usage = (response.llm_output or {}).get("token_usage") or {}
+            with self._lock:
+                task = getattr(self._local, "task", None) or self.tasks[-1]
+                task["llm_calls"] += 1
+                task["llm_seconds"] += time.monotonic() - started
+                task["prompt_tokens"] += usage.get("prompt_tokens", estimated_prompt_tokens)
+                task["completion_tokens"] += usage.get("completion_tokens", 0)
+
+    return LLMCallTimer
+
+
+def _build_rsac_crew(timer_class):
+    from crewai import Crew
+    from personas import MODEL, build_agents
+    from llm_client import get_llm
+    from rsac_tasks import TASK_SPECS, build_tasks
+    from streaming import task_title
+
+    timer = timer_class([task_title(spec["description"]) for spec in TASK_SPECS])
+    agents = build_agents(llm=get_llm(MODEL, callbacks=[timer]))
+    tasks = build_tasks(*agents)
+    for task in tasks:
+        task.callback = timer.task_done
+    return _RsacRun(Crew(agents=list(agents), tasks=tasks, verbose=0)), timer
+
+
+def _build_outline_crew(timer_class, scheduler="dag"):
+    from crewai import Crew
+    from ai_security_agents import AGENT_SPECS, MODEL, build_agent
+    from llm_client import get_llm
+    from tasks import TASK_SPECS, build_tasks
+
+    timer = timer_class(list(TASK_SPECS))
+    llm = get_llm(MODEL, callbacks=[timer])
+    agents = {name: build_agent(name, llm=llm) for name in ["researcher", *AGENT_SPECS]}
+    tasks = build_tasks(agents)
+    if scheduler == "dag":
+        return _DagRun(tasks, timer), timer
+    for task in tasks.values():
+        task.callback = timer.task_done
+    used_agents = list({id(task.agent): task.agent for task in tasks.values()}.values())
+    return Crew(agents=used_agents, tasks=list(tasks.values()), verbose=0), timer
+
+
+class _RsacRun:
+    """Runs the RSA crew the way rsac_pipeline does, with budgeted context between tasks."""
+
+    def __init__(self, crew):
+        self.crew = crew
+
+    def kickoff(self, inputs):
+        from rsac_pipeline import run_tasks
+        return run_tasks(self.crew, inputs)
+
+
+class _DagRun:
+    """Runs the outline tasks through the DAG scheduler behind the same kickoff() as a crew."""
+
+    def __init__(self, tasks, timer):
+        self.tasks = tasks
+        self.timer = timer
+
+    def kickoff(self, inputs):
+        from context_budget import build_context
+        from scheduler import run_dag
+        from tasks import dependencies
+        # As in the service, the root tasks get the seed and mission as their context
+        root_context = build_context({}, {}, inputs)
+        context = {name: root_context for name, depends_on in dependencies().items() if not depends_on}
+        return run_dag(self.tasks, dependencies(), inputs=inputs, on_start=self.timer.begin,
+                       on_done=self.timer.finish, context=context)
+
+
+def run_pipeline(name, seed_abstract, scheduler="dag"):
+    """Runs one pipeline end to end and returns its per-task timings.
+
+    `scheduler` picks how the outline pipeline runs: "dag" runs independent
+    tasks concurrently, "sequential" runs a plain crew. The RSA pipeline is a
+    straight chain and always runs as a crew.
+    """
+    timer_class = _callback_handler_class()
+    if name == "rsac":
+        crew, timer = _build_rsac_crew(timer_class)
+    else:
+        crew, timer = _build_outline_crew(timer_class, scheduler)
+
+    started = time.monotonic()
+    if not isinstance(crew, _DagRun):
+        timer.start()
+    # Agents are verbose; keep their console chatter out of the benchmark output
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        crew.kickoff(inputs={"abstract": seed_abstract, "topic": seed_abstract,
+                             "mission": "Create a compelling RSA Conference abstract."})
+    wall = time.monotonic() - started
+
+    tasks = []
+    for task in timer.tasks:
+        task_wall = task.get("wall_seconds", 0.0)
+        tasks.append({
+            "name": task["name"],
+            "wall_seconds": round(task_wall, 4),
+            "llm_seconds": round(task["llm_seconds"], 4),
+            "overhead_seconds": round(task_wall - task["llm_seconds"], 4),
+            "llm_calls": task["llm_calls"],
+            "prompt_tokens": task["prompt_tokens"],
+            "completion_tokens": task["completion_tokens"],
+        })
+    llm_seconds = sum(task["llm_seconds"] for task in tasks)
+    if isinstance(crew, _DagRun):
+        # Concurrent tasks overlap their LLM time, so wall minus LLM time would undercount
+        overhead = sum(task["overhead_seconds"] for task in tasks)
+    else:
+        overhead = wall - llm_seconds
+    return {
+        "wall_seconds": round(wall, 4),
+        "llm_seconds": round(llm_seconds, 4),
+        "overhead_seconds": round(overhead, 4),
+        "prompt_tokens": sum(task["prompt_tokens"] for task in tasks),
+        "tasks": tasks,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the hello-crew pipelines end to end.")
+    parser.add_argument("--mode", choices=["mock", "ollama"], default="mock",
+                        help="Use a local mock server (default) or a real Ollama instance.")
+    parser.add_argument("--base-url", default="http://localhost:11434/v1", help="Ollama endpoint for --mode ollama.")
+    parser.add_argument("--pipelines", default=",".join(PIPELINES), help="Comma-separated pipelines to run.")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per pipeline (default: 3).")
+    parser.add_argument("--scheduler", choices=["dag", "sequential"], default="dag",
+                        help="Run the outline pipeline's independent tasks concurrently (default) or in sequence.")
+    parser.add_argument("--seed", default=os.path.join(HERE, "rsac_seed.txt"), help="Seed file to use.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock time to first token in seconds.")
+    parser.add_argument("--tps", type=float, default=200.0, help="Mock tokens per second.")
+    parser.add_argument("--completion-tokens", type=int, default=120, help="Mock tokens per completion.")
+    parser.add_argument("--use-cache", action="store_true", help="Keep the LLM completion cache enabled.")
+    parser.add_argument("--output", default="bench_results.json", help="Where to write JSON results.")
+    args = parser.parse_args(argv)
+
+    pipelines = [name.strip() for name in args.pipelines.split(",") if name.strip()]
+    unknown = set(pipelines) - set(PIPELINES)
+    if unknown:
+        parser.error(f"unknown pipelines: {', '.join(sorted(unknown))}")
+
+    # The client factory and the cache read these on first use, so set them before any pipeline import
+    if not args.use_cache:
+        os.environ["LLM_CACHE"] = "0"
+    # The Researcher's web search tool replays recorded results, so runs stay offline and repeatable
+    os.environ.setdefault("SEARCH_BACKEND", "replay")
+    server = None
+    if args.mode == "mock":
+        server = MockOpenAIServer(latency=args.latency, tokens_per_second=args.tps,
+                                  completion_tokens=args.completion_tokens).start()
+        os.environ["LLM_BASE_URL"] = server.url
+    else:
+        os.environ["LLM_BASE_URL"] = args.base_url
+
+    from util import read_seed_file
+    seed_abstract = read_seed_file(args.seed)
+
+    results = {
+        "commit": _git_commit(),
+        "mode": args.mode,
+        "base_url": os.environ["LLM_BASE_URL"],
+        "config": {"runs": args.runs, "scheduler": args.scheduler, "latency": args.latency, "tps": args.tps,
+                   "completion_tokens": args.completion_tokens, "use_cache": args.use_cache,
+                   "search_backend": os.environ["SEARCH_BACKEND"]},
+        "pipelines": {},
+    }
+    try:
+        for name in pipelines:
+            runs = [run_pipeline(name, seed_abstract, args.scheduler) for _ in range(args.runs)]
+            results["pipelines"][name] = {"runs": runs}
+            best = min(runs, key=lambda run: run["wall_seconds"])
+            print(f"{name}: best wall {best['wall_seconds']:.2f}s, llm {best['llm_seconds']:.2f}s, "
+                  f"framework overhead {best['overhead_seconds']:.2f}s, prompt tokens {best['prompt_tokens']}")
+            for task in best["tasks"]:
+                print(f"  {task['name'][:50]:<50} overhead {task['overhead_seconds'] * 1000:8.1f} ms, "
+                      f"prompt {task['prompt_tokens']:6d} tokens")
+    finally:
+        if server is not None:
+            results["mock_server"] = server.stats.as_dict()
+            server.stop()
+
+    results["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+    print(f"Results written to {args.output} (peak RSS {results['peak_rss_mb']} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,89 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Commands that must start fast: they should never import the heavy frameworks
+SCENARIOS = {
+    "help": [sys.executable, "cli.py", "--help"],
+    "list-tasks": [sys.executable, "cli.py", "list-tasks"],
+    "list-outline-tasks": [sys.executable, "cli.py", "list-tasks", "--pipeline", "outline"],
+}
+
+# Importing these modules must not pull in any of the following packages
+LIGHT_MODULES = ["cli", "registry", "rsac_tasks", "tasks"]
+HEAVY_PACKAGES = ("crewai", "langchain", "langchain_core", "langchain_openai", "openai", "httpx")
+
+IMPORT_CHECK = (
+    "import sys\n"
+    f"for name in {LIGHT_MODULES!r}:\n"
+    "    __import__(name)\n"
+    f"heavy = sorted({{m.split('.')[0] for m in sys.modules}} & set({HEAVY_PACKAGES!r}))\n"
+    "print(','.join(heavy))\n"
+)
+
+
+def time_command(command, runs):
+    """Runs a command `runs` times and returns the wall times in milliseconds."""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(command, cwd=HERE, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def heavy_imports():
+    """Returns the heavy packages imported as a side effect of importing the light modules."""
+    result = subprocess.run([sys.executable, "-c", IMPORT_CHECK], cwd=HERE, check=True,
+                            capture_output=True, text=True)
+    return [name for name in result.stdout.strip().split(",") if name]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure hello-crew CLI startup time and catch import-time regressions.")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per scenario (default: 5).")
+    parser.add_argument("--budget-ms", type=float, default=500.0,
+                        help="Fail if any scenario's median exceeds this many milliseconds (default: 500).")
+    parser.add_argument("--output", help="Optional path for machine-readable JSON results.")
+    args = parser.parse_args(argv)
+
+    baseline = statistics.median(time_command([sys.executable, "-c", "pass"], args.runs))
+    results = {"python_startup_ms": round(baseline, 1), "budget_ms": args.budget_ms, "scenarios": {}}
+    failed = False
+
+    for name, command in SCENARIOS.items():
+        timings = time_command(command, args.runs)
+        median = statistics.median(timings)
+        over_budget = median > args.budget_ms
+        failed = failed or over_budget
+        results["scenarios"][name] = {
+            "median_ms": round(median, 1),
+            "min_ms": round(min(timings), 1),
+            "over_interpreter_ms": round(median - baseline, 1),
+            "over_budget": over_budget,
+        }
+        print(f"{name:<20} median {median:7.1f} ms (+{median - baseline:.1f} ms over bare interpreter)"
+              f"{'  OVER BUDGET' if over_budget else ''}")
+
+    heavy = heavy_imports()
+    results["heavy_imports"] = heavy
+    if heavy:
+        failed = True
+        print(f"Importing {', '.join(LIGHT_MODULES)} pulled in: {', '.join(heavy)}")
+    else:
+        print(f"Importing {', '.join(LIGHT_MODULES)} pulls in no heavy packages.")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,162 @@
+"""Routes each task to the cheapest model tier whose output passes validation.
+
+A task's spec lists the tiers to try in order ("tiers") and the checks its
+output must pass ("checks"). The first tier runs; if a fast validator
+rejects its output, the task is retried on the next tier, and the last
+tier's output is kept whatever it holds. Tier usage is counted per task
+so the policy can be tuned.
+"""
+import threading
+from collections import defaultdict
+
+import ai_security_agents
+import personas
+import tracing
+from context_budget import compact, extract_fields
+from llm_client import derive_llm
+
+# Tier name -> model, cheapest first
+TIERS = {
+    "small": personas.MODEL,
+    "large": ai_security_agents.MODEL,
+}
+
+
+def validate(output, checks):
+    """Returns the problems found in `output`; an empty list means it passed.
+
+    Supported checks:
+      max_chars: {field: limit} for labelled fields (see context_budget.extract_fields);
+                 a missing field is a problem too. The field "output" means the whole output.
+      required:  words or phrases that must appear, case-insensitively, e.g. section names.
+    """
+    problems = []
+    text = compact(output or "")
+    if not text:
+        return ["empty output"]
+    limits = dict((checks or {}).get("max_chars", {}))
+    output_limit = limits.pop("output", None)
+    if output_limit is not None and len(text) > output_limit:
+        problems.append(f"output is {len(text)} characters (limit {output_limit})")
+    fields = extract_fields(text, list(limits)) if limits else {}
+    for field, limit in limits.items():
+        if field not in fields:
+            problems.append(f"missing {field}")
+        elif len(fields[field]) > limit:
+            problems.append(f"{field} is {len(fields[field])} characters (limit {limit})")
+    lowered = text.lower()
+    problems.extend(f"missing section '{phrase}'" for phrase in (checks or {}).get("required", ())
+                    if phrase.lower() not in lowered)
+    return problems
+
+
+class CascadeStats:
+    """Counts, per task, which tier produced the kept output and how often each tier was rejected."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tasks = defaultdict(lambda: {"attempts": defaultdict(int), "rejected": defaultdict(int),
+                                           "kept": defaultdict(int)})
+
+    def record(self, task, tier, problems, kept):
+        with self._lock:
+            row = self._tasks[task]
+            row["attempts"][tier] += 1
+            if problems:
+                row["rejected"][tier] += 1
+            if kept:
+                row["kept"][tier] += 1
+
+    def stats(self):
+        """Returns {task: {"attempts"|"rejected"|"kept": {tier: count}}} plus an "all" total."""
+        with self._lock:
+            rows = {task: {key: dict(counts) for key, counts in row.items()} for task, row in self._tasks.items()}
+        total = {"attempts": defaultdict(int), "rejected": defaultdict(int), "kept": defaultdict(int)}
+        for row in rows.values():
+            for key, counts in row.items():
+                for tier, count in counts.items():
+                    total[key][tier] += count
+        rows["all"] = {key: dict(counts) for key, counts in total.items()}
+        return rows
+
+    def reset(self):
+        with self._lock:
+            self._tasks.clear()
+
+
+# Process-wide tier usage, shared by every crew (and every seed of a batch)
+cascade_stats = CascadeStats()
+
+
+def format_stats(stats):
+    """Renders CascadeStats.stats() as one line per task: kept outputs and rejections per tier."""
+    lines = []
+    for task, row in stats.items():
+        kept = ", ".join(f"{tier} {count}" for tier, count in row["kept"].items()) or "none"
+        rejected = ", ".join(f"{tier} {count}" for tier, count in row["rejected"].items()) or "none"
+        lines.append(f"{task}: kept {kept}; rejected {rejected}")
+    return "\n".join(lines)
+
+
+def execute_task(task, context, spec):
+    """Runs a task through crewai's agent executor."""
+    return task.execute(context=context)
+
+
+class CascadeRouter:
+    """Runs a task on each tier of its policy until the output validates.
+
+    The agent's own LLM serves the first tier. Later tiers are copies of it
+    with another model name, so they keep its callbacks (streaming, tracing)
+    and go through the same pooled client and completion cache.
+    """
+
+    def __init__(self, tiers=TIERS, stats=cascade_stats):
+        self.tiers = tiers
+        self.stats = stats
+        self._llms = {}
+
+    def _llm_for(self, base_llm, tier):
+        model = self.tiers[tier]
+        if getattr(base_llm, "model_name", None) == model:
+            return base_llm
+        key = (id(base_llm), model)
+        if key not in self._llms:
+            self._llms[key] = derive_llm(base_llm, model_name=model)
+        return self._llms[key]
+
+    def policy(self, spec):
+        """The tiers a task tries, in order, and the models they map to."""
+        return [(tier, self.tiers[tier]) for tier in spec.get("tiers", list(self.tiers))]
+
+    def run(self, name, task, context, spec, execute=None, on_reject=None):
+        """Executes `task`, escalating through its tiers; returns (output, tier).
+
+        `execute(task, context, spec)` runs one attempt on the agent's current
+        LLM (default: crewai's Task.execute). `on_reject(name, tier, problems)`
+        is called for every output that is discarded in favour of the next tier.
+        """
+        execute = execute or execute_task
+        agent = task.agent
+        base_llm, callback = agent.llm, task.callback
+        policy = self.policy(spec)
+        # The task callback marks the task as done, so it fires once, for the kept output
+        task.callback = None
+        try:
+            for attempt, (tier, _) in enumerate(policy, start=1):
+                agent.llm = self._llm_for(base_llm, tier)
+                output = execute(task, context, spec)
+                problems = validate(output, spec.get("checks"))
+                last = attempt == len(policy)
+                self.stats.record(name, tier, problems, kept=not problems or last)
+                tracing.emit("model_route", tier=tier, model=agent.llm.model_name, problems=problems,
+                             escalated=bool(problems) and not last)
+                if not problems or last:
+                    break
+                if on_reject is not None:
+                    on_reject(name, tier, problems)
+        finally:
+            agent.llm, task.callback = base_llm, callback
+        if callback is not None:
+            callback(task.output)
+        return output, tier
@@ -0,0 +1,86 @@
+import json
+import os
+import tempfile
+import time
+
+from util import content_hash
+
+DEFAULT_CHECKPOINT_DIR = "checkpoints"
+
+
+def task_fingerprint(task, agent):
+    """Everything about a task and its agent that changes the task's output."""
+    llm = agent.llm
+    return {
+        "description": task.description,
+        "expected_output": task.expected_output,
+        "agent": {"role": agent.role, "goal": agent.goal, "backstory": agent.backstory},
+        "model": getattr(llm, "model_name", None),
+        "temperature": getattr(llm, "temperature", None),
+    }
+
+
+class CheckpointStore:
+    """Task outputs stored under a hash of everything that produced them.
+
+    A task's key covers the run inputs (seed and mission), the hash of the
+    context built from its upstream outputs, the task text, the agent config
+    and the model, so a checkpoint stays valid exactly as long as none of
+    those change. Run manifests record which tasks a run has finished, for
+    --resume.
+    """
+
+    def __init__(self, root=DEFAULT_CHECKPOINT_DIR):
+        self.root = root
+        self.tasks_dir = os.path.join(root, "tasks")
+        self.runs_dir = os.path.join(root, "runs")
+        os.makedirs(self.tasks_dir, exist_ok=True)
+        os.makedirs(self.runs_dir, exist_ok=True)
+
+    @staticmethod
+    def task_key(inputs, upstream_hashes, fingerprint):
+        return content_hash({"inputs": inputs, "upstream": upstream_hashes, "task": fingerprint})
+
+    def _task_path(self, key):
+        return os.path.join(self.tasks_dir, key[:2], f"{key}.json")
+
+    @staticmethod
+    def _write_json(path, value):
+        """Writes atomically so a crash never leaves a half-written checkpoint behind."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            json.dump(value, file, indent=2)
+        os.replace(tmp_path, path)
+
+    def load(self, key):
+        """Returns the checkpoint stored under `key`, or None."""
+        try:
+            with open(self._task_path(key), "r", encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def save(self, key, name, output, **fields):
+        """Stores a task's output; extra fields (e.g. the model tier that produced it) are kept alongside."""
+        record = {"key": key, "task": name, "output": output, "output_hash": content_hash(output),
+                  "created": time.time(), **fields}
+        self._write_json(self._task_path(key), record)
+        return record
+
+    def save_run(self, manifest):
+        self._write_json(os.path.join(self.runs_dir, f"{manifest['run_id']}.json"), manifest)
+
+    def load_run(self, run_id=None):
+        """Loads a run manifest by id, or the most recently updated unfinished one when run_id is None."""
+        if run_id is not None:
+            with open(os.path.join(self.runs_dir, f"{run_id}.json"), "r", encoding="utf-8") as file:
+                return json.load(file)
+        manifests = [os.path.join(self.runs_dir, name) for name in os.listdir(self.runs_dir)
+                     if name.endswith(".json")]
+        for path in sorted(manifests, key=os.path.getmtime, reverse=True):
+            with open(path, "r", encoding="utf-8") as file:
+                manifest = json.load(file)
+            if manifest.get("status") != "complete":
+                return manifest
+        raise FileNotFoundError(f"No interrupted runs to resume in '{self.runs_dir}'.")
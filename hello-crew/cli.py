@@ -0,0 +1,68 @@
+"""Command-line entry point for the hello-crew pipelines.
+
+Only the standard library is imported up front: each command's module is
+imported when the command runs, so `--help` and task listings never pay
+for crewai, langchain or LLM client setup.
+"""
+import argparse
+import importlib
+import sys
+
+# Command name -> (module, function, help); the function receives the remaining arguments
+COMMANDS = {
+    "run": ("rsac_pipeline", "main", "Generate one RSA Conference submission from a seed file."),
+    "batch": ("rsac_batch", "main", "Run the RSA pipeline over a directory or JSONL file of seeds."),
+    "list-tasks": ("cli", "list_tasks", "List the tasks of a pipeline without building any agents."),
+    "cache": ("llm_cache", "main", "Show statistics for, or clear, the shared LLM completion cache."),
+    "trace": ("tracing", "main", "Summarize a JSONL run trace as a table."),
+    "bench": ("bench_pipelines", "main", "Benchmark both pipelines against a mock server or Ollama."),
+    "mock-server": ("mock_server", "main", "Serve a mock OpenAI-compatible chat completions endpoint."),
+    "tune": ("autotune", "main", "Measure inference throughput and save the best thread/parallelism settings."),
+    "runs": ("run_store", "main", "Query stored runs: latest submission for a seed, runs by model or time."),
+    "retrieve": ("retrieval", "main", "Build or query the offline index over the seed, application and past outputs."),
+    "serve": ("service", "main", "Keep crews warm and run submission jobs from HTTP or a file queue."),
+}
+
+# Pipeline name -> module holding its TASK_SPECS
+PIPELINES = {
+    "rsac": "rsac_tasks",
+    "outline": "tasks",
+}
+
+
+def list_tasks(argv=None):
+    parser = argparse.ArgumentParser(prog="cli.py list-tasks", description=COMMANDS["list-tasks"][2])
+    parser.add_argument("--pipeline", choices=sorted(PIPELINES), default="rsac")
+    args = parser.parse_args(argv)
+
+    specs = importlib.import_module(PIPELINES[args.pipeline]).TASK_SPECS
+    items = specs.items() if isinstance(specs, dict) else enumerate(specs, start=1)
+    for name, spec in items:
+        first_line = spec["description"].strip().splitlines()[0].lstrip("# ").strip()
+        agent = f" [{spec['agent']}]" if "agent" in spec else ""
+        after = f" (after {', '.join(spec['depends_on'])})" if spec.get("depends_on") else ""
+        print(f"{name}{agent}{after}: {first_line}")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="cli.py",
+        description="Agentic pipelines for drafting RSA Conference submissions.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="commands:\n" + "\n".join(f"  {name:<12} {help_text}" for name, (_, _, help_text) in COMMANDS.items()),
+    )
+    parser.add_argument("command", choices=list(COMMANDS), metavar="command", help="One of the commands below.")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="Arguments for the command (see `cli.py <command> --help`).")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    module_name, function_name, _ = COMMANDS[args.command]
+    module = sys.modules[__name__] if module_name == "cli" else importlib.import_module(module_name)
+    return getattr(module, function_name)(args.args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
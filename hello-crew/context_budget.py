@@ -0,0 +1,125 @@
+"""Builds each task's context from upstream outputs within a token budget.
+
+crewai puts a task's context after the persona and the task instructions,
+which never change between runs. The context is laid out from most to least
+stable (mission, then the upstream fields the task reads, then the seed) so
+the model server can reuse its prompt cache for everything before it.
+"""
+import json
+import re
+
+# Rough tokens-per-character ratio for English text; close enough for budgeting
+CHARS_PER_TOKEN = 4
+DEFAULT_SEED_TOKENS = 512
+
+_ELLIPSIS = " [...]"
+# A "Label: value" line, tolerating list numbering, headings and bold markers around the label
+_LABEL_LINE = re.compile(r"^[\s>#*\-\d.)]*\**\s*(?P<label>[A-Za-z][\w /&-]{0,40}?)\s*\**\s*:\s*\**\s*(?P<rest>.*)$")
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token) used when no tokenizer is available."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN if text else 0
+
+
+def compact(text):
+    """Strips the formatting noise that costs tokens but carries no content."""
+    text = text.replace("**", "")
+    text = re.sub(r"[ \t]+", " ", text)
+    text = re.sub(r" *\n *", "\n", text)
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Keeps whole lines, then whole sentences of the first line that overflows, within max_tokens."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    limit = max(max_tokens * CHARS_PER_TOKEN - len(_ELLIPSIS), 0)
+    kept, size = [], 0
+    for line in text.splitlines():
+        if size + len(line) + 1 > limit:
+            head = line[:max(limit - size, 0)]
+            sentence_end = max(head.rfind(". "), head.rfind("! "), head.rfind("? "))
+            if sentence_end > 0:
+                kept.append(head[:sentence_end + 1])
+            elif not kept:
+                kept.append(head)
+            break
+        kept.append(line)
+        size += len(line) + 1
+    return "\n".join(kept).rstrip() + _ELLIPSIS
+
+
+def json_fields(text):
+    """Returns the string values of the JSON object in `text`, keyed by lower-cased key, or None."""
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end < start:
+        return None
+    try:
+        value = json.loads(text[start:end + 1])
+    except ValueError:
+        return None
+    if not isinstance(value, dict):
+        return None
+    return {str(key).lower(): item for key, item in value.items() if isinstance(item, str)}
+
+
+def extract_fields(text, fields):
+    """Pulls labelled fields, e.g. "**Session Title:** ...", out of free-form model output.
+
+    A field's value runs from its label to the next blank line or label. A
+    label matches a field when it ends with the field name, so "Session Title"
+    matches "title". Structured (JSON) outputs are matched on their keys the
+    same way. Returns a dict holding the fields that were found.
+    """
+    values = json_fields(text)
+    if values is not None:
+        keys = {field: next((key for key in values if key.endswith(field.lower())), None) for field in fields}
+        return {field: values[key] for field, key in keys.items() if key is not None}
+    found, current = {}, None
+    for line in text.splitlines():
+        match = _LABEL_LINE.match(line)
+        label = match.group("label").strip().lower() if match else None
+        field = next((name for name in fields if label and label.endswith(name.lower())), None)
+        if field is not None and field not in found:
+            current = field
+            found[field] = [match.group("rest").strip("* ")]
+        elif match is not None or not line.strip():
+            current = None
+        elif current is not None:
+            found[current].append(line.strip())
+    return {field: " ".join(part for part in parts if part) for field, parts in found.items()}
+
+
+def upstream_context(outputs, reads, max_tokens):
+    """Renders the parts of earlier outputs a task reads, within max_tokens.
+
+    `outputs` maps task numbers to outputs and `reads` maps task numbers to
+    the fields to extract, or None for the whole (compacted) output. When
+    the fields are not found, the whole output is used instead. Whole
+    outputs share whatever budget the extracted fields leave.
+    """
+    fields_parts, whole_parts = [], []
+    for number in sorted(reads):
+        text = compact(outputs[number])
+        fields = extract_fields(text, reads[number]) if reads[number] else {}
+        if fields:
+            fields_parts.append("\n".join(f"{field.capitalize()}: {value}" for field, value in fields.items()))
+        else:
+            whole_parts.append(text)
+    remaining = max(max_tokens - sum(estimate_tokens(text) for text in fields_parts), 0)
+    parts = fields_parts + [truncate_to_tokens(text, remaining // len(whole_parts)) for text in whole_parts]
+    return truncate_to_tokens("\n\n".join(parts), max_tokens) if parts else ""
+
+
+def build_context(spec, outputs, inputs, seed_tokens=DEFAULT_SEED_TOKENS):
+    """Lays out a task's context: mission, then the upstream fields it reads, then the seed."""
+    sections = []
+    if inputs.get("mission"):
+        sections.append(f"Mission: {inputs['mission']}")
+    upstream = upstream_context(outputs, spec.get("reads") or {}, spec.get("context_tokens", 0))
+    if upstream:
+        sections.append(f"Earlier results:\n{upstream}")
+    if inputs.get("abstract"):
+        sections.append(f"Seed abstract:\n{truncate_to_tokens(compact(inputs['abstract']), seed_tokens)}")
+    return "\n\n".join(sections)
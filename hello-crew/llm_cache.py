@@ -0,0 +1,162 @@
+import argparse
+import hashlib
+import os
+import threading
+import time
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+
+import tracing
+from util import sqlite_connection
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "llm_cache.sqlite")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class CompletionCache(BaseCache):
+    """Content-addressed, size-bounded LRU cache for LLM completions.
+
+    Entries live in a SQLite database in WAL mode, so several processes can
+    read and write the same cache file at once. The key is a SHA-256 of the
+    LangChain llm_string (model name plus sampling parameters) and the full prompt.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS completions ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS completions_last_access ON completions (last_access)")
+
+    def _connection(self):
+        return sqlite_connection(self._local, self.path)
+
+    @staticmethod
+    def make_key(prompt, llm_string):
+        """Hashes the model/sampling description and the prompt into a cache key."""
+        digest = hashlib.sha256()
+        digest.update(llm_string.encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(prompt.encode("utf-8"))
+        return digest.hexdigest()
+
+    def lookup(self, prompt, llm_string):
+        key = self.make_key(prompt, llm_string)
+        conn = self._connection()
+        row = conn.execute("SELECT value FROM completions WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            with self._stats_lock:
+                self.misses += 1
+            tracing.emit("cache_lookup", hit=False)
+            return None
+        conn.execute("UPDATE completions SET last_access = ? WHERE key = ?", (time.time(), key))
+        with self._stats_lock:
+            self.hits += 1
+        tracing.emit("cache_lookup", hit=True)
+        return loads(row[0])
+
+    def update(self, prompt, llm_string, return_val):
+        key = self.make_key(prompt, llm_string)
+        value = dumps(list(return_val))
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO completions (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, len(value.encode("utf-8")), time.time()),
+            )
+            self._evict(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _evict(self, conn):
+        """Drops least recently used entries until the cache fits in max_bytes."""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        conn.execute(
+            "DELETE FROM completions WHERE key IN ("
+            " SELECT key FROM ("
+            "  SELECT key, SUM(size) OVER (ORDER BY last_access DESC, key) AS running FROM completions"
+            " ) WHERE running > ?)",
+            (self.max_bytes,),
+        )
+
+    def clear(self, **kwargs):
+        self._connection().execute("DELETE FROM completions")
+        with self._stats_lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Returns hit/miss counts for this process and the size of the shared cache."""
+        entries, size = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions"
+        ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+        }
+
+
+_completion_cache = None
+_completion_cache_lock = threading.Lock()
+
+
+def get_completion_cache():
+    """Returns the process-wide completion cache, or None when LLM_CACHE=0.
+
+    LLM_CACHE_PATH and LLM_CACHE_MAX_MB override the location and size bound.
+    """
+    global _completion_cache
+    if os.environ.get("LLM_CACHE", "1") == "0":
+        return None
+    with _completion_cache_lock:
+        if _completion_cache is None:
+            max_mb = float(os.environ.get("LLM_CACHE_MAX_MB", DEFAULT_MAX_BYTES / (1024 * 1024)))
+            _completion_cache = CompletionCache(
+                path=os.environ.get("LLM_CACHE_PATH", DEFAULT_CACHE_PATH),
+                max_bytes=int(max_mb * 1024 * 1024),
+            )
+        return _completion_cache
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or clear the shared LLM completion cache.")
+    parser.add_argument("command", choices=["stats", "clear"])
+    args = parser.parse_args(argv)
+
+    cache = get_completion_cache()
+    if cache is None:
+        print("LLM cache is disabled (LLM_CACHE=0).")
+        return 0
+    if args.command == "clear":
+        cache.clear()
+        print(f"Cleared LLM cache at {cache.path}")
+    else:
+        for name, value in cache.stats().items():
+            print(f"{name}: {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,351 @@
+import json
+import os
+import random
+import threading
+import time
+
+import httpx
+from langchain_openai import ChatOpenAI
+
+import tracing
+from llm_cache import get_completion_cache
+
+DEFAULT_BASE_URL = "http://localhost:11434/v1"
+# Written by autotune.py; holds the measured best settings per model
+DEFAULT_TUNING_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm_tuning.json")
+MOCK_TUNING_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm_tuning.mock.json")
+
+# Status codes worth retrying: the server is overloaded, restarting or swapping models
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class ServerBusyError(RuntimeError):
+    """Raised when too many requests are already queued for a model."""
+
+
+class PooledChatOpenAI(ChatOpenAI):
+    """ChatOpenAI that only streams when it was built with streaming=True.
+
+    crewai's agent executor always calls stream(), and LangChain skips the
+    completion cache on that path. Non-streaming clients answer stream()
+    with a single invoke(), which goes through the cache.
+    """
+
+    def stream(self, input, config=None, *, stop=None, **kwargs):
+        if self.streaming:
+            yield from super().stream(input, config, stop=stop, **kwargs)
+        else:
+            yield self.invoke(input, config, stop=stop, **kwargs)
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def _env_float(name, default):
+    return float(os.environ.get(name, default))
+
+
+class ModelGate:
+    """Caps concurrent requests to one model (or one server) and bounds how many may wait for a slot."""
+
+    def __init__(self, max_concurrency, max_queue, queue_timeout):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+
+    def acquire(self, model):
+        with self._lock:
+            if self.waiting >= self.max_queue:
+                raise ServerBusyError(f"{self.waiting} requests already queued for '{model}'.")
+            self.waiting += 1
+        try:
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+        if not acquired:
+            raise ServerBusyError(f"Timed out after {self.queue_timeout}s waiting for a '{model}' slot.")
+        with self._lock:
+            self.in_flight += 1
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+
+class _GatedStream(httpx.SyncByteStream):
+    """Holds the model slot until the response body is fully consumed or closed."""
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+        self._released = False
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            if not self._released:
+                self._released = True
+                self._release()
+
+
+class PooledTransport(httpx.BaseTransport):
+    """Shared keep-alive connection pool with per-model concurrency caps and jittered retries.
+
+    Every client built by get_llm() goes through one instance of this
+    transport, so parallel crews share connections and respect one
+    concurrency cap per model instead of each opening their own. An optional
+    server-wide cap bounds the requests across all models, so cascade tiers
+    on one Ollama server do not make it swap models. Requests for a model
+    listed in `variants` are sent to that server-side model instead, e.g. the
+    num_thread variant autotune.py created, under the original model's cap.
+    """
+
+    def __init__(self, limits, default_concurrency, max_queue, queue_timeout, retries, backoff, max_backoff):
+        self._transport = httpx.HTTPTransport(limits=limits)
+        self.default_concurrency = default_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.concurrency = {}
+        self.variants = {}
+        self.server_gate = None
+        self._gates = {}
+        self._lock = threading.Lock()
+
+    def gate(self, model):
+        with self._lock:
+            if model not in self._gates:
+                self._gates[model] = ModelGate(
+                    self.concurrency.get(model, self.default_concurrency), self.max_queue, self.queue_timeout
+                )
+            return self._gates[model]
+
+    def set_concurrency(self, model, max_concurrency):
+        """Sets the cap for one model; applies to requests that start after the call."""
+        with self._lock:
+            self.concurrency[model] = max_concurrency
+            self._gates.pop(model, None)
+
+    def set_server_concurrency(self, max_concurrency):
+        """Caps in-flight requests across all models (None removes the cap); applies to later requests."""
+        with self._lock:
+            self.server_gate = None if max_concurrency is None else ModelGate(
+                max_concurrency, self.max_queue, self.queue_timeout)
+
+    def _retry_delay(self, attempt, response=None):
+        if response is not None and "retry-after" in response.headers:
+            try:
+                return min(float(response.headers["retry-after"]), self.max_backoff)
+            except ValueError:
+                pass
+        # Full jitter keeps parallel crews from retrying in lockstep
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+
+    def handle_request(self, request):
+        model = _request_model(request)
+        if model in self.variants:
+            request = _with_model(request, self.variants[model])
+        gate = self.gate(model)
+        gate.acquire(model)
+        server_gate = self.server_gate
+        if server_gate is not None:
+            try:
+                server_gate.acquire(request.url.netloc.decode("ascii"))
+            except BaseException:
+                gate.release()
+                raise
+
+        def release():
+            if server_gate is not None:
+                server_gate.release()
+            gate.release()
+
+        try:
+            for attempt in range(self.retries + 1):
+                last_attempt = attempt == self.retries
+                try:
+                    response = self._transport.handle_request(request)
+                except (httpx.TimeoutException, httpx.ConnectError, httpx.RemoteProtocolError) as exc:
+                    if last_attempt:
+                        raise
+                    tracing.emit("retry", model=model, attempt=attempt + 1, error=repr(exc))
+                    time.sleep(self._retry_delay(attempt))
+                    continue
+                if response.status_code not in RETRY_STATUS_CODES or last_attempt:
+                    return httpx.Response(
+                        status_code=response.status_code,
+                        headers=response.headers,
+                        stream=_GatedStream(response.stream, release),
+                        extensions=response.extensions,
+                    )
+                response.close()
+                tracing.emit("retry", model=model, attempt=attempt + 1, status=response.status_code)
+                time.sleep(self._retry_delay(attempt, response))
+        except BaseException:
+            release()
+            raise
+
+    def close(self):
+        self._transport.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                model: {"in_flight": gate.in_flight, "waiting": gate.waiting, "max_concurrency": gate.max_concurrency}
+                for model, gate in self._gates.items()
+            }
+
+
+def _request_model(request):
+    """Reads the model name from an OpenAI-style JSON request body."""
+    try:
+        return json.loads(request.content or b"{}").get("model") or "default"
+    except (ValueError, AttributeError):
+        return "default"
+
+
+def _with_model(request, model):
+    """Returns a copy of an OpenAI-style JSON request that asks for another model."""
+    body = json.loads(request.content)
+    body["model"] = model
+    headers = httpx.Headers(request.headers)
+    headers.pop("content-length", None)
+    return httpx.Request(request.method, request.url, headers=headers, content=json.dumps(body).encode("utf-8"),
+                         extensions=request.extensions)
+
+
+def tuned_settings(path=None, base_url=None):
+    """Returns {model: settings} from the autotune file, or {} when there is none.
+
+    Settings tuned against another server than `base_url` (default: LLM_BASE_URL) are ignored.
+    """
+    path = path or os.environ.get("LLM_TUNING_FILE", DEFAULT_TUNING_PATH)
+    base_url = base_url or os.environ.get("LLM_BASE_URL", DEFAULT_BASE_URL)
+    try:
+        with open(path, "r") as file:
+            tuning = json.load(file)
+    except FileNotFoundError:
+        return {}
+    if tuning.get("base_url", base_url).rstrip("/") != base_url.rstrip("/"):
+        return {}
+    return tuning.get("models", {})
+
+
+def tuned_concurrency(path=None, base_url=None):
+    """Returns {model: max_concurrency} from the autotune file."""
+    return {model: settings["max_concurrency"] for model, settings in tuned_settings(path, base_url).items()
+            if settings.get("max_concurrency")}
+
+
+def tuned_variants(path=None, base_url=None):
+    """Returns {model: variant} for models autotune.py built a num_thread variant of."""
+    return {model: settings["variant"] for model, settings in tuned_settings(path, base_url).items()
+            if settings.get("variant")}
+
+
+_transport = None
+_http_client = None
+_clients = {}
+_lock = threading.Lock()
+
+
+def get_transport():
+    """Returns the shared transport, configured from the environment on first use.
+
+    LLM_MAX_CONCURRENCY (per model, default 2), LLM_MAX_SERVER_CONCURRENCY
+    (across all models, default uncapped), LLM_MAX_QUEUE (64),
+    LLM_QUEUE_TIMEOUT (600s), LLM_RETRIES (3), LLM_BACKOFF (0.5s),
+    LLM_MAX_CONNECTIONS (16) and LLM_KEEPALIVE_EXPIRY (60s) tune it.
+    Unless LLM_MAX_CONCURRENCY is set, per-model caps measured by
+    autotune.py (LLM_TUNING_FILE, default llm_tuning.json) take precedence;
+    its num_thread variants always replace the models they were built from.
+    """
+    global _transport, _http_client
+    with _lock:
+        if _transport is None:
+            _transport = PooledTransport(
+                limits=httpx.Limits(
+                    max_connections=_env_int("LLM_MAX_CONNECTIONS", 16),
+                    max_keepalive_connections=_env_int("LLM_MAX_CONNECTIONS", 16),
+                    keepalive_expiry=_env_float("LLM_KEEPALIVE_EXPIRY", 60),
+                ),
+                default_concurrency=_env_int("LLM_MAX_CONCURRENCY", 2),
+                max_queue=_env_int("LLM_MAX_QUEUE", 64),
+                queue_timeout=_env_float("LLM_QUEUE_TIMEOUT", 600),
+                retries=_env_int("LLM_RETRIES", 3),
+                backoff=_env_float("LLM_BACKOFF", 0.5),
+                max_backoff=_env_float("LLM_MAX_BACKOFF", 30),
+            )
+            if "LLM_MAX_CONCURRENCY" not in os.environ:
+                _transport.concurrency.update(tuned_concurrency())
+            _transport.variants.update(tuned_variants())
+            if "LLM_MAX_SERVER_CONCURRENCY" in os.environ:
+                _transport.set_server_concurrency(_env_int("LLM_MAX_SERVER_CONCURRENCY", 0))
+            _http_client = httpx.Client(transport=_transport, timeout=_env_float("LLM_TIMEOUT", 600))
+        return _transport
+
+
+def get_http_client():
+    """Returns the httpx client shared by every LLM client."""
+    get_transport()
+    return _http_client
+
+
+def set_model_concurrency(model, max_concurrency):
+    """Caps the number of in-flight requests for one model."""
+    get_transport().set_concurrency(model, max_concurrency)
+
+
+def set_server_concurrency(max_concurrency):
+    """Caps the number of in-flight requests to the server across all models."""
+    get_transport().set_server_concurrency(max_concurrency)
+
+
+def get_llm(model, **overrides):
+    """Returns a ChatOpenAI client for `model` on the shared pool.
+
+    Clients without overrides are shared per model. Overrides (for example
+    streaming=True with callbacks) build a new client on the same pool.
+    LLM_BASE_URL points every client at another OpenAI-compatible server.
+    """
+    if not overrides:
+        with _lock:
+            if model in _clients:
+                return _clients[model]
+    settings = dict(
+        model=model,
+        base_url=os.environ.get("LLM_BASE_URL", DEFAULT_BASE_URL),
+        openai_api_key='NA',
+        http_client=get_http_client(),
+        max_retries=0,  # Retries happen in the shared transport, with jitter
+        cache=get_completion_cache()  # Shared on-disk completion cache (disable with LLM_CACHE=0)
+    )
+    settings.update(overrides)
+    client = PooledChatOpenAI(**settings)
+    if not overrides:
+        with _lock:
+            client = _clients.setdefault(model, client)
+    return client
+
+
+def derive_llm(llm, **overrides):
+    """Returns a copy of a ChatOpenAI client with some fields changed, e.g. model_name or max_tokens.
+
+    The copy keeps the client's callbacks (streaming, tracing), pool and cache.
+    """
+    # copy() would drop the fields langchain excludes from serialization, such as callbacks and client
+    fields = {name: getattr(llm, name) for name in llm.__fields__}
+    return type(llm)(**{**fields, **overrides})
@@ -0,0 +1,207 @@
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from context_budget import estimate_tokens
+from util import send_json
+
+# Filler vocabulary for generated completions
+WORDS = (
+    "community driven defense lets organizations share threat intelligence about attacks on AI systems "
+    "in real time so that every member benefits from the detections of the others"
+).split()
+
+
+class MockStats:
+    """Thread-safe counters for the requests a mock server has answered."""
+
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.busy_seconds = 0.0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def begin(self):
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def end(self, prompt_tokens, completion_tokens, seconds):
+        with self._lock:
+            self.in_flight -= 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.busy_seconds += seconds
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "busy_seconds": round(self.busy_seconds, 3),
+                "max_in_flight": self.max_in_flight,
+            }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output clean
+
+    def _send_json(self, status, payload):
+        send_json(self, status, payload)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/v1/models":
+            self._send_json(200, {"object": "list", "data": [{"id": "mock", "object": "model"}]})
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        self.server.mock.handle_completion(self, request)
+
+
+class MockOpenAIServer:
+    """Local stand-in for an OpenAI-compatible /v1/chat/completions endpoint.
+
+    Replies take `latency` seconds before the first token and then emit
+    tokens at `tokens_per_second`, streamed as server-sent events when the
+    request asks for it. Answers use the ReAct "Final Answer:" format so
+    crewai agents finish in one step.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.05, tokens_per_second=200.0, completion_tokens=120):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.stats = MockStats()
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.mock = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _completion_tokens(self, request):
+        """Builds the completion as a list of tokens, honouring max_tokens."""
+        count = self.completion_tokens
+        if request.get("max_tokens"):
+            count = min(count, int(request["max_tokens"]))
+        body = [f" {WORDS[i % len(WORDS)]}" for i in range(max(0, count - 8))]
+        return ["Thought:", " I", " now", " can", " give", " a", " great", " answer\nFinal Answer:"][:count] + body
+
+    def handle_completion(self, handler, request):
+        started = time.monotonic()
+        self.stats.begin()
+        prompt = "".join(str(message.get("content", "")) for message in request.get("messages", []))
+        prompt_tokens = estimate_tokens(prompt)
+        tokens = self._completion_tokens(request)
+        model = request.get("model", "mock")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        try:
+            time.sleep(self.latency)
+            if request.get("stream"):
+                self._stream(handler, completion_id, model, tokens)
+            else:
+                time.sleep(len(tokens) / self.tokens_per_second)
+                handler._send_json(200, {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "".join(tokens)},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": len(tokens),
+                        "total_tokens": prompt_tokens + len(tokens),
+                    },
+                })
+        finally:
+            self.stats.end(prompt_tokens, len(tokens), time.monotonic() - started)
+
+    def _stream(self, handler, completion_id, model, tokens):
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Cache-Control", "no-cache")
+        handler.send_header("Connection", "close")
+        handler.end_headers()
+
+        def send(delta, finish_reason=None):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            handler.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            handler.wfile.flush()
+
+        send({"role": "assistant", "content": ""})
+        for token in tokens:
+            time.sleep(1 / self.tokens_per_second)
+            send({"content": token})
+        send({}, finish_reason="stop")
+        handler.wfile.write(b"data: [DONE]\n\n")
+        handler.wfile.flush()
+        handler.close_connection = True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a mock OpenAI-compatible chat completions server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds before the first token (default: 0.05).")
+    parser.add_argument("--tps", type=float, default=200.0, help="Generated tokens per second (default: 200).")
+    parser.add_argument("--completion-tokens", type=int, default=120, help="Tokens per completion (default: 120).")
+    args = parser.parse_args(argv)
+
+    server = MockOpenAIServer(args.host, args.port, args.latency, args.tps, args.completion_tokens)
+    print(f"Mock OpenAI server listening on {server.url} (Ctrl+C to stop)")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+        print(f"Served: {server.stats.as_dict()}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
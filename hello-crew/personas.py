@@ -1,25 +1,36 @@
 from crewai import Agent
-from langchain_openai import ChatOpenAI
+from llm_client import get_llm as get_pooled_llm
+from registry import LazyRegistry
+from retrieval import retrieval_tools
 
-# Setup for the LLM
-llm = ChatOpenAI(
-    model="llama3.2:1b-instruct-q8_0",  # Replace with your preferred model
-    base_url="http://localhost:11434/v1",
-    openai_api_key='NA'
-)
+MODEL = "llama3.2:1b-instruct-q8_0"  # Replace with your preferred model
+
+
+def build_llm(**overrides):
+    """Returns the persona model client from the shared pool; overrides such as streaming=True build a new one."""
+    return get_pooled_llm(MODEL, **overrides)
+
+# Agents and the shared LLM are built on first use, so importing this module stays cheap
+_registry = LazyRegistry()
+_registry.register("llm", build_llm)
+
+
+def get_llm():
+    """Returns the shared persona LLM client, building it on first use."""
+    return _registry.get("llm")
 
 # Define Agents for the Simplified RSA Abstract Pipeline
 class RSAAgents:
     # Combined Title and Abstract Generator Agent
     class RSATitleAbstractGenerator(Agent):
-        def __init__(self):
+        def __init__(self, llm=None):
             super().__init__(
                 role="RSAC Title and Abstract Generator",
                 goal="Create compelling titles and concise abstracts that clearly communicate the session’s value.",
                 backstory="You specialize in crafting impactful titles and abstracts for technical sessions, focusing on clarity and engagement.",
                 allow_delegation=False,
                 verbose=True,
-                llm=llm
+                llm=llm if llm is not None else get_llm()
             )
 
         def execute(self, task_description, context=None):
@@ -40,14 +51,15 @@ class RSAAgents:
 
     # Detail Writer Agent
     class RSADetailWriter(Agent):
-        def __init__(self):
+        def __init__(self, llm=None):
             super().__init__(
                 role="RSAC Detail Writer",
                 goal="Develop comprehensive session details that include actionable takeaways and align with RSA guidelines.",
                 backstory="You create session details that resonate with technical and business leaders, using real-world examples and case studies.",
+                tools=retrieval_tools(),  # Seed, application guide and past outputs, searched offline
                 allow_delegation=False,
                 verbose=True,
-                llm=llm
+                llm=llm if llm is not None else get_llm()
             )
 
         def execute(self, task_description, context=None):
@@ -76,14 +88,15 @@ class RSAAgents:
 
     # SME Reviewer Agent
     class SMEReviewer(Agent):
-        def __init__(self):
+        def __init__(self, llm=None):
             super().__init__(
                 role="SME Reviewer",
                 goal="Review and refine the session details based on RSA standards and audience expectations.",
                 backstory="You have extensive experience presenting at RSA and validating technical content for accuracy.",
+                tools=retrieval_tools(),
                 allow_delegation=False,
                 verbose=True,
-                llm=llm
+                llm=llm if llm is not None else get_llm()
             )
 
         def execute(self, task_description, context=None):
@@ -105,7 +118,17 @@ class RSAAgents:
 
             return {"refined_details": refined_details}
 
-# Instantiate agents
-RSATitleAbstractGenerator = RSAAgents.RSATitleAbstractGenerator()
-RSADetailWriter = RSAAgents.RSADetailWriter()
-SMEReviewer = RSAAgents.SMEReviewer()
+def build_agents(llm=None):
+    """Builds a fresh set of agents so that parallel crews never share agent state."""
+    return (
+        RSAAgents.RSATitleAbstractGenerator(llm=llm),
+        RSAAgents.RSADetailWriter(llm=llm),
+        RSAAgents.SMEReviewer(llm=llm),
+    )
+
+# Register the default agents; `from personas import SMEReviewer` builds them lazily
+_registry.register("RSATitleAbstractGenerator", RSAAgents.RSATitleAbstractGenerator)
+_registry.register("RSADetailWriter", RSAAgents.RSADetailWriter)
+_registry.register("SMEReviewer", RSAAgents.SMEReviewer)
+
+__getattr__ = _registry.module_getattr(__name__)
@@ -0,0 +1,58 @@
+import threading
+
+
+class LazyRegistry:
+    """Maps names to zero-argument factories and builds each object on first use.
+
+    Modules expose registry entries as module attributes through a
+    module-level __getattr__, so `from personas import SMEReviewer` keeps
+    working while importing the module itself stays cheap.
+    """
+
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        self._lock = threading.RLock()
+
+    def register(self, name, factory):
+        with self._lock:
+            self._factories[name] = factory
+            self._instances.pop(name, None)
+
+    def __contains__(self, name):
+        return name in self._factories
+
+    def names(self):
+        return list(self._factories)
+
+    def is_built(self, name):
+        return name in self._instances
+
+    def get(self, name):
+        """Returns the object registered as `name`, building it on the first call."""
+        try:
+            return self._instances[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._instances:
+                if name not in self._factories:
+                    raise KeyError(f"Nothing registered under '{name}'.")
+                self._instances[name] = self._factories[name]()
+            return self._instances[name]
+
+    def reset(self, name=None):
+        """Drops built instances so the next get() rebuilds them."""
+        with self._lock:
+            if name is None:
+                self._instances.clear()
+            else:
+                self._instances.pop(name, None)
+
+    def module_getattr(self, module_name):
+        """Builds a module-level __getattr__ that resolves names from this registry."""
+        def __getattr__(name):
+            if name in self:
+                return self.get(name)
+            raise AttributeError(f"module '{module_name}' has no attribute '{name}'")
+        return __getattr__
@@ -0,0 +1,690 @@
+"""Offline retrieval over the seed, the RSA application guide and past outputs.
+
+Documents are split into passages of a few paragraphs and indexed for BM25.
+The index is a few segments, each a directory of flat files that queries
+memory-map:
+
+  terms.json     term -> [first posting, document frequency]
+  postings.bin   passage numbers grouped by term, uint16 in segments of up
+                 to 65535 passages; frequencies.bin holds each posting's
+                 term frequency as a byte (capped at 255)
+  lengths.bin    uint32 passage lengths in tokens
+  passages.bin   zlib-compressed passage texts back to back; passages.json
+                 holds their offsets and the documents they came from
+
+Refreshes are incremental. The source files form one segment, rebuilt only
+when a file changes, from a compressed per-document cache of passages and
+term counts. Runs completed since the last refresh are appended as a new
+segment, so a refresh reads only the new runs, and small run segments are
+merged now and then. A refresh writes its segments and then points CURRENT
+at them, so readers never see a half-written index. Refreshes hold an
+exclusive lock on the index directory, so batch workers, the service and
+the CLI can share one index, and the segments CURRENT named before are kept
+for readers that picked them up just before the switch.
+
+With sentence-transformers installed, passages can also be embedded on the
+CPU (embeddings.f32); queries are then ranked by BM25 and cosine similarity,
+fused by rank.
+"""
+import argparse
+import array
+import fcntl
+import functools
+import glob
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import zlib
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+import tracing
+from util import content_hash
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_INDEX_DIR = os.path.join(HERE, ".cache", "retrieval")
+# Files (glob patterns, relative to hello-crew) indexed besides the outputs in the run store;
+# logs/output_log_*.txt are submissions saved before runs went to the run store
+DEFAULT_SOURCES = ("rsac_seed.txt", "rsac_application", "logs/output_log_*.txt")
+DEFAULT_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+DEFAULT_TOP_K = 4
+
+CHUNK_WORDS = 120
+CHUNK_OVERLAP = 20
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Reciprocal rank fusion constant and how many candidates each ranking contributes
+RRF_K = 60
+FUSION_CANDIDATES = 50
+# Run segments kept before the smaller ones are merged, and seconds between run-store checks
+MAX_RUN_SEGMENTS = 8
+# Passages per segment that still fit 16-bit postings; larger documents get a segment of their own
+MAX_SEGMENT_PASSAGES = 65535
+REFRESH_INTERVAL = 5.0
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by can for from has have how in into is it its of on or our that the their them "
+    "they this to was were what when which will with you your".split()
+)
+
+
+def tokenize(text):
+    return [token for token in _TOKEN.findall(text.lower()) if len(token) > 1 and token not in STOPWORDS]
+
+
+def chunk_text(text, chunk_words=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+    """Splits text into passages of whole paragraphs up to chunk_words words; longer paragraphs are windowed."""
+    passages, current, size = [], [], 0
+    for paragraph in re.split(r"\n\s*\n", text):
+        words = paragraph.split()
+        if not words:
+            continue
+        if current and size + len(words) > chunk_words:
+            passages.append("\n".join(current))
+            current, size = [], 0
+        if len(words) > chunk_words:
+            for start in range(0, len(words) - overlap, chunk_words - overlap):
+                passages.append(" ".join(words[start:start + chunk_words]))
+            continue
+        current.append(" ".join(words))
+        size += len(words)
+    if current:
+        passages.append("\n".join(current))
+    return passages
+
+
+def collect_files(sources=DEFAULT_SOURCES, root=HERE):
+    """Yields (document id, text) for the files matching `sources`; a directory includes every file below it."""
+    paths = []
+    for source in sources:
+        for match in sorted(glob.glob(os.path.join(root, source))):
+            if os.path.isdir(match):
+                paths.extend(sorted(os.path.join(folder, name) for folder, _, names in os.walk(match) for name in names))
+            else:
+                paths.append(match)
+    for path in dict.fromkeys(paths):
+        with open(path, "r", encoding="utf-8", errors="replace") as file:
+            yield os.path.relpath(path, root), file.read()
+
+
+@functools.lru_cache(maxsize=None)
+def _open_run_store(path):
+    from run_store import RunStore
+    return RunStore(path)
+
+
+def _run_store_version(path):
+    """The run store's position of its newest completed run (see RunStore.version); 0 if there is no store."""
+    if not path or not os.path.exists(path):
+        return 0
+    return _open_run_store(os.path.abspath(path)).version()
+
+
+def collect_runs(run_store_path, after=0, through=None):
+    """Yields (document id, text) for the outputs of the completed runs at store positions after..through."""
+    if not run_store_path or not os.path.exists(run_store_path):
+        return
+    for run_id, name, text in _open_run_store(os.path.abspath(run_store_path)).outputs(after=after, through=through):
+        if text:
+            yield f"run {run_id}: {name}", text
+
+
+class SentenceTransformerEmbedder:
+    """CPU passage embeddings through sentence-transformers; the model must already be downloaded to run offline."""
+
+    def __init__(self, model_name=DEFAULT_EMBEDDING_MODEL):
+        from sentence_transformers import SentenceTransformer  # Imported lazily; BM25 never needs it
+        self.name = model_name
+        self.model = SentenceTransformer(model_name, device="cpu")
+
+    def encode(self, texts):
+        """Returns unit-length float32 vectors, one row per text."""
+        return self.model.encode(list(texts), normalize_embeddings=True, convert_to_numpy=True).astype("float32")
+
+
+def _write_atomic(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as file:
+        file.write(data)
+    os.replace(tmp_path, path)
+
+
+def _read_current(index_dir):
+    try:
+        with open(os.path.join(index_dir, "CURRENT"), "r") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def _document_digest(text):
+    # Keyed by the chunking settings too, so changing them re-chunks every document
+    return content_hash({"chunking": [CHUNK_WORDS, CHUNK_OVERLAP], "text": text})
+
+
+def _tokenized(text):
+    passages = chunk_text(text)
+    return {"passages": passages, "terms": [Counter(tokenize(passage)) for passage in passages]}
+
+
+def _cached_document(cache_dir, digest, text, embedder):
+    """Returns a file's passages and term counts (and embeddings), computing only what is not cached."""
+    path = os.path.join(cache_dir, f"{digest}.json.z")
+    computed = False
+    if os.path.exists(path):
+        with open(path, "rb") as file:
+            document = json.loads(zlib.decompress(file.read()))
+        document["terms"] = [Counter(terms) for terms in document["terms"]]
+    else:
+        document = _tokenized(text)
+        _write_atomic(path, zlib.compress(json.dumps(document).encode("utf-8"), 6))
+        computed = True
+    if embedder is not None:
+        import numpy
+        model = re.sub(r"[^\w.-]", "_", embedder.name)
+        vectors_path = os.path.join(cache_dir, f"{digest}.{model}.f32")
+        if os.path.exists(vectors_path):
+            vectors = numpy.fromfile(vectors_path, dtype="float32")
+        else:
+            vectors = _embed(embedder, document["passages"])
+            _write_atomic(vectors_path, vectors.tobytes())
+        document["vectors"] = vectors
+    return document, computed
+
+
+def _embed(embedder, passages):
+    import numpy
+    return embedder.encode(passages).reshape(-1) if passages else numpy.zeros(0, "float32")
+
+
+def _write_segment(index_dir, documents, sources, texts, lengths, postings, vectors=None, embedder=None):
+    """Writes one segment and returns its name.
+
+    `documents` lists the [id, digest] pairs it holds; `sources`, `texts`
+    (zlib-compressed passages) and `lengths` have one entry per passage, and
+    `postings` maps each term to its flat (passage, term frequency) pairs.
+    """
+    name = f"seg_{time.time_ns()}"
+    segment_dir = os.path.join(index_dir, name)
+    os.makedirs(segment_dir)
+    offsets, position = [], 0
+    with open(os.path.join(segment_dir, "passages.bin"), "wb") as file:
+        for text in texts:
+            offsets.append([position, len(text)])
+            file.write(text)
+            position += len(text)
+    posting_type = "H" if len(lengths) <= MAX_SEGMENT_PASSAGES else "I"
+    terms, numbers, frequencies = {}, array.array(posting_type), array.array("B")
+    for term in sorted(postings):
+        pairs = postings[term]
+        terms[term] = [len(numbers), len(pairs) // 2]
+        numbers.extend(pairs[0::2])
+        frequencies.extend(min(count, 255) for count in pairs[1::2])
+    with open(os.path.join(segment_dir, "postings.bin"), "wb") as file:
+        numbers.tofile(file)
+    with open(os.path.join(segment_dir, "frequencies.bin"), "wb") as file:
+        frequencies.tofile(file)
+    with open(os.path.join(segment_dir, "lengths.bin"), "wb") as file:
+        array.array("I", lengths).tofile(file)
+    with open(os.path.join(segment_dir, "terms.json"), "w") as file:
+        json.dump(terms, file, separators=(",", ":"))
+    with open(os.path.join(segment_dir, "passages.json"), "w") as file:
+        json.dump({"offsets": offsets, "sources": sources}, file, separators=(",", ":"))
+    with open(os.path.join(segment_dir, "documents.json"), "w") as file:
+        json.dump(documents, file, separators=(",", ":"))
+    meta = {"passages": len(lengths), "total_length": sum(lengths), "postings": posting_type, "embedder": None}
+    if embedder is not None and vectors is not None and len(lengths):
+        vectors.tofile(os.path.join(segment_dir, "embeddings.f32"))
+        meta.update(embedder=embedder.name, dimensions=vectors.size // len(lengths))
+    with open(os.path.join(segment_dir, "meta.json"), "w") as file:
+        json.dump(meta, file)
+    return name
+
+
+def _segments_from_documents(index_dir, entries, embedder):
+    """Writes (doc id, digest, tokenized document) entries as segments of up to MAX_SEGMENT_PASSAGES passages.
+
+    Returns the segment names and the number of passages written.
+    """
+    names, batch, size, total = [], [], 0, 0
+    for entry in entries:
+        passages = len(entry[2]["passages"])
+        if batch and size + passages > MAX_SEGMENT_PASSAGES:
+            names.append(_segment_from_documents(index_dir, batch, embedder))
+            batch, size = [], 0
+        batch.append(entry)
+        size += passages
+        total += passages
+    if batch or not names:
+        names.append(_segment_from_documents(index_dir, batch, embedder))
+    return names, total
+
+
+def _segment_from_documents(index_dir, entries, embedder):
+    sources, texts, lengths, postings, vectors = [], [], [], defaultdict(list), []
+    for doc_id, _, document in entries:
+        for passage, terms in zip(document["passages"], document["terms"]):
+            number = len(lengths)
+            sources.append(doc_id)
+            texts.append(zlib.compress(passage.encode("utf-8"), 6))
+            lengths.append(sum(terms.values()))
+            for term, count in terms.items():
+                postings[term].extend((number, count))
+        if embedder is not None:
+            vectors.append(document["vectors"])
+    matrix = None
+    if embedder is not None and vectors:
+        import numpy
+        matrix = numpy.concatenate(vectors)
+    documents = [[doc_id, digest] for doc_id, digest, _ in entries]
+    return _write_segment(index_dir, documents, sources, texts, lengths, postings, matrix, embedder)
+
+
+def _merge_segments(index_dir, names, embedder):
+    """Writes one segment holding every passage of the named segments; returns its name."""
+    documents, sources, texts, lengths, postings, vectors = [], [], [], [], defaultdict(list), []
+    for name in names:
+        segment = _Segment(os.path.join(index_dir, name), embedder)
+        try:
+            base = len(lengths)
+            documents.extend(segment.documents())
+            sources.extend(segment.sources)
+            texts.extend(bytes(segment.texts[start:start + size]) for start, size in segment.offsets)
+            lengths.extend(segment.lengths)
+            for term, (first, frequency) in segment.terms.items():
+                merged = postings[term]
+                for number, count in zip(segment.postings[first:first + frequency].tolist(),
+                                         segment.frequencies[first:first + frequency].tolist()):
+                    merged.extend((base + number, count))
+            if segment.vectors is not None:
+                vectors.append(segment.vectors.reshape(-1).copy())
+        finally:
+            segment.close()
+    matrix = None
+    if embedder is not None and vectors:
+        import numpy
+        matrix = numpy.concatenate(vectors)
+    return _write_segment(index_dir, documents, sources, texts, lengths, postings, matrix, embedder)
+
+
+@contextmanager
+def _build_lock(index_dir):
+    """Holds an exclusive lock on the index directory; other builds wait for it."""
+    os.makedirs(index_dir, exist_ok=True)
+    with open(os.path.join(index_dir, "LOCK"), "a") as file:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+
+def refresh_index(index_dir=DEFAULT_INDEX_DIR, sources=DEFAULT_SOURCES, run_store_path=None, embedder=None,
+                  root=HERE):
+    """Brings the index up to date with the files in `sources` and the run store; returns what it did.
+
+    The files form one segment, rewritten when any of them changes; files
+    that did not change come from the per-document cache. Runs completed
+    since the last refresh are read, and only they, and appended as a new
+    segment; a document already in the index is not indexed again. Past
+    MAX_RUN_SEGMENTS run segments, the smallest are merged. Changing
+    the chunking or the embedder rebuilds everything.
+    """
+    with _build_lock(index_dir):
+        return _refresh_index(index_dir, sources, run_store_path, embedder, root)
+
+
+def _refresh_index(index_dir, sources, run_store_path, embedder, root):
+    cache_dir = os.path.join(index_dir, "cache")
+    os.makedirs(cache_dir, exist_ok=True)
+    previous = _read_current(index_dir) or {}
+    settings = {"chunking": [CHUNK_WORDS, CHUNK_OVERLAP], "embedder": embedder.name if embedder is not None else None,
+                "run_store": os.path.abspath(run_store_path) if run_store_path else None}
+    current = dict(previous) if previous.get("settings") == settings else {"settings": settings}
+    current.setdefault("run_segments", [])
+    result = {"tokenized": 0, "runs_added": 0, "passages_added": 0, "rewritten": False}
+
+    files = [(doc_id, _document_digest(text), text) for doc_id, text in collect_files(sources, root)]
+    files_fingerprint = content_hash([entry[:2] for entry in files])
+    if "files_segments" not in current or current.get("files_fingerprint") != files_fingerprint:
+        entries = []
+        for doc_id, digest, text in files:
+            document, computed = _cached_document(cache_dir, digest, text, embedder)
+            entries.append((doc_id, digest, document))
+            result["tokenized"] += computed
+        current["files_segments"], _ = _segments_from_documents(index_dir, entries, embedder)
+        current["files_fingerprint"] = files_fingerprint
+        result["rewritten"] = True
+        referenced = {digest for _, digest, _ in files}
+        for name in os.listdir(cache_dir):
+            if name.split(".")[0] not in referenced and not name.endswith(".tmp"):
+                try:
+                    os.remove(os.path.join(cache_dir, name))
+                except OSError:
+                    pass
+
+    version = _run_store_version(run_store_path)
+    if version < current.get("runs_through", 0):
+        current["run_segments"], current["runs_through"] = [], 0  # A different or rebuilt store
+    if version > current.get("runs_through", 0):
+        seen = {digest for _, digest, _ in files}
+        for name in current["run_segments"]:
+            with open(os.path.join(index_dir, name, "documents.json"), "r") as file:
+                seen.update(digest for _, digest in json.load(file))
+        entries, run_ids = [], set()
+        for doc_id, text in collect_runs(run_store_path, current.get("runs_through", 0), version):
+            run_ids.add(doc_id.split(":")[0])
+            digest = _document_digest(text)
+            if digest in seen:
+                continue  # Identical outputs (e.g. served from the completion cache) are indexed once
+            seen.add(digest)
+            document = _tokenized(text)
+            if embedder is not None:
+                document["vectors"] = _embed(embedder, document["passages"])
+            entries.append((doc_id, digest, document))
+        if entries:
+            names, result["passages_added"] = _segments_from_documents(index_dir, entries, embedder)
+            current["run_segments"].extend(names)
+        current["runs_through"] = version
+        result["runs_added"], result["tokenized"] = len(run_ids), result["tokenized"] + len(entries)
+        result["rewritten"] = True
+
+    if len(current["run_segments"]) > MAX_RUN_SEGMENTS:
+        # Merge the smallest run segments into one that still fits 16-bit postings
+        sizes = {}
+        for name in current["run_segments"]:
+            with open(os.path.join(index_dir, name, "meta.json"), "r") as file:
+                sizes[name] = json.load(file)["passages"]
+        smallest, size = [], 0
+        for name in sorted(sizes, key=sizes.get):
+            if size + sizes[name] > MAX_SEGMENT_PASSAGES:
+                break
+            smallest.append(name)
+            size += sizes[name]
+        if len(smallest) > 1:
+            merged = _merge_segments(index_dir, smallest, embedder)
+            current["run_segments"] = [name for name in current["run_segments"] if name not in smallest] + [merged]
+
+    if result["rewritten"]:
+        _write_atomic(os.path.join(index_dir, "CURRENT"), json.dumps(current).encode("utf-8"))
+        # Open readers keep their mapped files, and a reader that has just read the old CURRENT still
+        # finds its segments; drop every other segment
+        keep = set(_segment_names(current)) | set(_segment_names(previous))
+        for name in os.listdir(index_dir):
+            if name.startswith(("seg_", "gen_")) and name not in keep:
+                shutil.rmtree(os.path.join(index_dir, name), ignore_errors=True)
+    result["segments"] = len(_segment_names(current))
+    return result
+
+
+def _segment_names(current):
+    return list(current.get("files_segments", [])) + list(current.get("run_segments", []))
+
+
+def _map(path):
+    """Memory-maps a file read-only; returns the mapping (None for an empty file) and its bytes."""
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return None, memoryview(b"")
+        mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    return mapping, memoryview(mapping)
+
+
+class _Segment:
+    """One memory-mapped segment of the index."""
+
+    def __init__(self, path, embedder=None):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "r") as file:
+            self.meta = json.load(file)
+        with open(os.path.join(path, "terms.json"), "r") as file:
+            self.terms = json.load(file)
+        with open(os.path.join(path, "passages.json"), "r") as file:
+            passages = json.load(file)
+        self.offsets, self.sources = passages["offsets"], passages["sources"]
+        self._mappings = []
+        self.postings = self._map("postings.bin", self.meta["postings"])
+        self.frequencies = self._map("frequencies.bin")
+        self.lengths = self._map("lengths.bin", "I")
+        self.texts = self._map("passages.bin")
+        self.vectors = None
+        if embedder is not None and embedder.name == self.meta["embedder"]:
+            import numpy
+            self.vectors = numpy.memmap(os.path.join(path, "embeddings.f32"), dtype="float32", mode="r",
+                                        shape=(self.meta["passages"], self.meta["dimensions"]))
+
+    def _map(self, name, format=None):
+        mapping, view = _map(os.path.join(self.path, name))
+        views = [view] if format is None else [view.cast(format), view]
+        self._mappings.append((mapping, views))
+        return views[0]
+
+    def documents(self):
+        with open(os.path.join(self.path, "documents.json"), "r") as file:
+            return json.load(file)
+
+    def passage(self, number):
+        start, size = self.offsets[number]
+        return zlib.decompress(self.texts[start:start + size]).decode("utf-8")
+
+    def close(self):
+        self.vectors = None
+        for mapping, views in self._mappings:
+            for view in views:
+                view.release()
+            if mapping is not None:
+                mapping.close()
+        self._mappings = []
+
+
+class RetrievalIndex:
+    """Read-only view of the current index segments, memory-mapped.
+
+    BM25 statistics (passage count, average length, document frequencies)
+    are summed over the segments, so scores do not depend on how the
+    passages are split between them.
+    """
+
+    def __init__(self, index_dir=DEFAULT_INDEX_DIR, embedder=None):
+        current = _read_current(index_dir)
+        if current is None:
+            raise FileNotFoundError(f"No retrieval index in '{index_dir}'; build one with `python retrieval.py build`.")
+        self.runs_through = current.get("runs_through", 0)
+        self.segments = [_Segment(os.path.join(index_dir, name), embedder) for name in _segment_names(current)]
+        self.embedder = embedder if embedder is not None and embedder.name == current["settings"]["embedder"] else None
+        self.passages = sum(segment.meta["passages"] for segment in self.segments)
+        self.avg_length = sum(segment.meta["total_length"] for segment in self.segments) / (self.passages or 1)
+
+    def passage(self, key):
+        segment, number = key
+        return self.segments[segment].passage(number)
+
+    def source(self, key):
+        segment, number = key
+        return self.segments[segment].sources[number]
+
+    def bm25(self, query, limit):
+        """Returns up to `limit` ((segment, passage), score) pairs, best first."""
+        avg_length = self.avg_length or 1.0
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            found = [(number, segment.terms[term]) for number, segment in enumerate(self.segments)
+                     if term in segment.terms]
+            if not found:
+                continue
+            frequency = sum(entry[1] for _, entry in found)
+            idf = math.log(1 + (self.passages - frequency + 0.5) / (frequency + 0.5))
+            for number, (first, segment_frequency) in found:
+                segment = self.segments[number]
+                last = first + segment_frequency
+                for passage, term_count in zip(segment.postings[first:last], segment.frequencies[first:last]):
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * segment.lengths[passage] / avg_length)
+                    scores[(number, passage)] += idf * term_count * (BM25_K1 + 1) / (term_count + norm)
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+    def dense(self, query, limit):
+        """Returns up to `limit` ((segment, passage), cosine similarity) pairs, best first."""
+        import numpy
+        vector = self.embedder.encode([query])[0]
+        ranked = []
+        for number, segment in enumerate(self.segments):
+            if segment.vectors is None or not len(segment.vectors):
+                continue
+            similarities = segment.vectors @ vector
+            for passage in numpy.argsort(-similarities)[:limit]:
+                ranked.append(((number, int(passage)), float(similarities[passage])))
+        return heapq.nlargest(limit, ranked, key=lambda item: item[1])
+
+    def search(self, query, k=DEFAULT_TOP_K):
+        """Returns the top-k passages as dicts with source, text and score."""
+        if self.embedder is None:
+            ranked = self.bm25(query, k)
+        else:
+            fused = defaultdict(float)
+            for ranking in (self.bm25(query, FUSION_CANDIDATES), self.dense(query, FUSION_CANDIDATES)):
+                for rank, (key, _) in enumerate(ranking, start=1):
+                    fused[key] += 1 / (RRF_K + rank)
+            ranked = heapq.nlargest(k, fused.items(), key=lambda item: item[1])
+        return [{"source": self.source(key), "text": self.passage(key), "score": round(score, 4)}
+                for key, score in ranked]
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+        self.segments = []
+
+
+def format_passages(passages):
+    if not passages:
+        return "No matching passages in the local documents."
+    return "\n\n".join(f"[{number}] ({passage['source']})\n{passage['text']}"
+                       for number, passage in enumerate(passages, start=1))
+
+
+_index = None
+_index_checked = 0.0
+_refreshing = False
+_index_lock = threading.Lock()
+
+
+def _index_settings():
+    from run_store import DEFAULT_STORE_PATH
+    return (os.environ.get("RETRIEVAL_INDEX_DIR", DEFAULT_INDEX_DIR),
+            os.environ.get("RUN_STORE_PATH", DEFAULT_STORE_PATH))
+
+
+def _refresh_in_background(embedder):
+    global _index, _refreshing
+    index_dir, run_store_path = _index_settings()
+    try:
+        refresh_index(index_dir, run_store_path=run_store_path, embedder=embedder)
+        index = RetrievalIndex(index_dir, embedder)
+        with _index_lock:
+            # The replaced index is not closed: other threads may still be reading it
+            _index = index
+    except Exception as exc:
+        print(f"Retrieval index refresh failed: {exc!r}")
+    finally:
+        with _index_lock:
+            _refreshing = False
+
+
+def get_retrieval_index():
+    """Returns the process-wide index, refreshing it from the default sources on first use.
+
+    After that the run store is checked at most every REFRESH_INTERVAL
+    seconds. When it has new completed runs, a background thread appends
+    them and swaps in the refreshed index, so a search never waits for a
+    refresh; changed source files are picked up on the next start.
+    RETRIEVAL_INDEX_DIR moves the index, and RETRIEVAL_EMBEDDINGS names a
+    sentence-transformers model to add dense ranking.
+    """
+    global _index, _index_checked, _refreshing
+    index_dir, run_store_path = _index_settings()
+    with _index_lock:
+        if _index is None:
+            model = os.environ.get("RETRIEVAL_EMBEDDINGS")
+            embedder = SentenceTransformerEmbedder(model) if model else None
+            refresh_index(index_dir, run_store_path=run_store_path, embedder=embedder)
+            _index, _index_checked = RetrievalIndex(index_dir, embedder), time.monotonic()
+        elif not _refreshing and time.monotonic() - _index_checked >= REFRESH_INTERVAL:
+            _index_checked = time.monotonic()
+            if _run_store_version(run_store_path) != _index.runs_through:
+                _refreshing = True
+                threading.Thread(target=_refresh_in_background, args=(_index.embedder,),
+                                 name="retrieval-refresh", daemon=True).start()
+        return _index
+
+
+def search_local(query, k=DEFAULT_TOP_K):
+    """Returns the top-k local passages for `query`, formatted for an agent."""
+    started = time.monotonic()
+    passages = get_retrieval_index().search(query, k)
+    tracing.emit("tool_call", tool="search_local_documents", results=len(passages),
+                 duration=time.monotonic() - started)
+    return format_passages(passages)
+
+
+def retrieval_tools():
+    """The local retrieval tool for agents, or none when LOCAL_RETRIEVAL=0."""
+    if os.environ.get("LOCAL_RETRIEVAL", "1") == "0":
+        return []
+    from langchain_core.tools import Tool
+    return [Tool(
+        name="search_local_documents",
+        func=search_local,
+        description=(
+            "Searches the local seed abstract, the RSA application guidelines and past submissions. "
+            f"Input is a search query; returns the {DEFAULT_TOP_K} most relevant passages with their sources."
+        ),
+    )]
+
+
+def main(argv=None):
+    from run_store import DEFAULT_STORE_PATH
+
+    parser = argparse.ArgumentParser(description="Build and query the local retrieval index.")
+    parser.add_argument("--index-dir", default=os.environ.get("RETRIEVAL_INDEX_DIR", DEFAULT_INDEX_DIR),
+                        help="Index directory (default: RETRIEVAL_INDEX_DIR or .cache/retrieval).")
+    parser.add_argument("--embeddings", nargs="?", const=DEFAULT_EMBEDDING_MODEL,
+                        default=os.environ.get("RETRIEVAL_EMBEDDINGS"), metavar="MODEL",
+                        help=f"Also rank by sentence-transformers embeddings (default model: {DEFAULT_EMBEDDING_MODEL}).")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Index the seed, application and new past outputs.")
+    build.add_argument("--source", action="append",
+                       help=f"File, directory or glob to index; repeatable (default: {', '.join(DEFAULT_SOURCES)}).")
+    build.add_argument("--store", default=os.environ.get("RUN_STORE_PATH", DEFAULT_STORE_PATH),
+                       help="Run store whose outputs are indexed too.")
+    query = commands.add_parser("query", help="Print the top passages for a query.")
+    query.add_argument("text")
+    query.add_argument("-k", type=int, default=DEFAULT_TOP_K)
+    args = parser.parse_args(argv)
+
+    embedder = SentenceTransformerEmbedder(args.embeddings) if args.embeddings else None
+    if args.command == "build":
+        started = time.monotonic()
+        result = refresh_index(args.index_dir, args.source or DEFAULT_SOURCES, args.store, embedder)
+        print(f"Tokenized {result['tokenized']} documents; added {result['runs_added']} runs "
+              f"({result['passages_added']} passages); {result['segments']} segments, "
+              f"{'updated' if result['rewritten'] else 'unchanged'} in {time.monotonic() - started:.2f}s")
+    else:
+        index = RetrievalIndex(args.index_dir, embedder)
+        started = time.monotonic()
+        passages = index.search(args.text, args.k)
+        elapsed = (time.monotonic() - started) * 1000
+        print(format_passages(passages))
+        print(f"\n{len(passages)} passages in {elapsed:.1f} ms")
+        index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,149 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from cascade import TIERS, cascade_stats, format_stats
+from llm_cache import get_completion_cache
+from llm_client import set_model_concurrency, set_server_concurrency
+from rsac_pipeline import DEFAULT_MISSION, new_run_id, run_submission
+from run_store import RunStore, get_run_store
+from tracing import RunTracer
+from util import read_seed_file
+
+
+def load_seeds(source):
+    """Loads seeds from a directory of .txt files or from a JSONL file.
+
+    JSONL lines look like {"id": "...", "abstract": "...", "mission": "..."};
+    only "abstract" (or "seed") is required, and a missing id defaults to
+    the line number. Ids must be unique, since batch results are keyed by them.
+    """
+    seeds = []
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if name.endswith(".txt"):
+                seeds.append({
+                    "id": os.path.splitext(name)[0],
+                    "abstract": read_seed_file(os.path.join(source, name)),
+                    "mission": DEFAULT_MISSION,
+                })
+    elif os.path.isfile(source):
+        with open(source, "r") as file:
+            for line_no, line in enumerate(file, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                abstract = record.get("abstract") or record.get("seed")
+                if not abstract:
+                    raise ValueError(f"{source}:{line_no}: seed record has no 'abstract' or 'seed' field.")
+                seed_id = str(record.get("id", line_no))
+                if any(seed["id"] == seed_id for seed in seeds):
+                    raise ValueError(f"{source}:{line_no}: duplicate seed id '{seed_id}'.")
+                seeds.append({
+                    "id": seed_id,
+                    "abstract": abstract,
+                    "mission": record.get("mission", DEFAULT_MISSION),
+                })
+    else:
+        raise FileNotFoundError(f"Seed source '{source}' not found.")
+    return seeds
+
+
+def _run_seed(seed, run_store, verbose, trace_dir=None, structured=False):
+    """Runs one seed through its own crew and records the run, labelled with the seed id, in run_store."""
+    started = time.monotonic()
+    run_id = new_run_id()
+    # The trace shares the run's id, so `run_store.py show <run_id>` and the trace file line up
+    tracer = None if trace_dir is None else RunTracer(trace_dir, run_id=run_id)
+    run_submission(seed["abstract"], seed["mission"], verbose=verbose, tracer=tracer, run_id=run_id,
+                   run_store=run_store, label=seed["id"], structured=structured)
+    return run_id, time.monotonic() - started
+
+
+def run_batch(seeds, workers=2, run_store=None, verbose=0, max_inflight=None, trace_dir=None, structured=False):
+    """Runs the RSA crew over all seeds with at most `workers` seeds in flight.
+
+    Every seed builds its own agents and tasks. A crew runs its tasks
+    sequentially, so without `max_inflight` the LLM request cap is `workers`.
+    The cap holds for the server as a whole, whichever cascade tiers the
+    requests go to.
+    Runs are recorded in `run_store` (default: the process-wide run store).
+    """
+    run_store = run_store or get_run_store()
+    for model in TIERS.values():
+        set_model_concurrency(model, max_inflight or workers)
+    set_server_concurrency(max_inflight or workers)
+    results = {}
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_run_seed, seed, run_store, verbose, trace_dir, structured): seed["id"] for seed in seeds}
+        for future in as_completed(futures):
+            seed_id = futures[future]
+            try:
+                run_id, elapsed = future.result()
+                results[seed_id] = {"status": "ok", "run_id": run_id, "seconds": round(elapsed, 2)}
+                print(f"[{len(results)}/{len(seeds)}] {seed_id}: done in {elapsed:.1f}s")
+            except Exception as exc:
+                results[seed_id] = {"status": "error", "error": repr(exc)}
+                print(f"[{len(results)}/{len(seeds)}] {seed_id}: failed: {exc!r}")
+
+    wall = time.monotonic() - started
+    completed = sum(1 for result in results.values() if result["status"] == "ok")
+    completion_cache = get_completion_cache()
+    return {
+        "seeds": len(seeds),
+        "completed": completed,
+        "failed": len(seeds) - completed,
+        "workers": workers,
+        "max_inflight": max_inflight or workers,
+        "wall_seconds": round(wall, 2),
+        "seeds_per_minute": round(completed / wall * 60, 2) if wall > 0 else 0.0,
+        "llm_cache": completion_cache.stats() if completion_cache is not None else None,
+        "model_tiers": cascade_stats.stats(),
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the RSA abstract pipeline over many seeds in parallel.")
+    parser.add_argument("source", help="Directory of .txt seed files or a JSONL file of seed records.")
+    parser.add_argument("--workers", type=int, default=2, help="Seeds processed in parallel (default: 2).")
+    parser.add_argument("--max-inflight", type=int,
+                        help="Limit on in-flight LLM requests to the model server (default: --workers).")
+    parser.add_argument("--store", help="Run store for the per-seed runs (default: RUN_STORE_PATH or runs/runs.sqlite).")
+    parser.add_argument("--summary", help="Optional path for a JSON summary of the batch.")
+    parser.add_argument("--trace-dir", help="Write one JSONL trace per seed into this directory.")
+    parser.add_argument("--structured", action="store_true",
+                        help="Have each task return length-budgeted JSON fields instead of free text.")
+    parser.add_argument("--verbose", type=int, default=0, help="Crew verbosity level (default: 0).")
+    args = parser.parse_args(argv)
+
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.max_inflight is not None and args.max_inflight < 1:
+        parser.error("--max-inflight must be at least 1")
+
+    try:
+        seeds = load_seeds(args.source)
+    except (ValueError, FileNotFoundError) as exc:
+        parser.error(str(exc))
+    print(f"Running {len(seeds)} seeds with {args.workers} workers...")
+    run_store = RunStore(args.store) if args.store else get_run_store()
+    summary = run_batch(seeds, workers=args.workers, run_store=run_store, verbose=args.verbose,
+                        max_inflight=args.max_inflight, trace_dir=args.trace_dir, structured=args.structured)
+    print(f"Completed {summary['completed']}/{summary['seeds']} seeds in {summary['wall_seconds']}s "
+          f"({summary['seeds_per_minute']} seeds/min)")
+    print(f"Model tiers:\n{format_stats(summary['model_tiers'])}")
+    print(f"Runs recorded in {run_store.path} (python run_store.py list)")
+
+    if args.summary:
+        with open(args.summary, "w") as file:
+            json.dump(summary, file, indent=2)
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
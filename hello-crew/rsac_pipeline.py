@@ -1,48 +1,329 @@
+import argparse
+import time
+import uuid
 import warnings
+from contextlib import nullcontext
+from datetime import datetime
 from crewai import Crew
-from personas import RSATitleAbstractGenerator, RSADetailWriter, SMEReviewer
-from rsac_tasks import generate_title_abstract_task, generate_session_details_task, review_refine_task
-from util import read_seed_file, save_output_to_log
+import structured_output
+from cascade import CascadeRouter, cascade_stats, execute_task, format_stats
+from checkpoints import DEFAULT_CHECKPOINT_DIR, CheckpointStore, task_fingerprint
+from context_budget import build_context, extract_fields
+from llm_cache import get_completion_cache
+from personas import build_agents, build_llm
+from rsac_tasks import TASK_SPECS, build_tasks
+from streaming import StreamingLogHandler, stream_log_path, task_title
+from tracing import DEFAULT_TRACE_DIR, RunTracer, format_summary, summarize
+from run_store import RunStore, get_run_store
+from util import content_hash, read_seed_file
 
 warnings.filterwarnings('ignore')
 
-# Read the seed input from the seed file
-seed_abstract = read_seed_file("rsac_seed.txt")
-
-# Define the Crew Workflow for RSA Abstract Writing
-rsa_abstract_crew = Crew(
-    agents=[
-        RSATitleAbstractGenerator,  # Generates both title and abstract
-        RSADetailWriter,            # Detail writer for session content
-        SMEReviewer                 # SME reviewer for final refinement
-    ],
-    tasks=[
-        generate_title_abstract_task,      # Generates both title and abstract
-        generate_session_details_task,     # Develops detailed session description based on abstract
-        review_refine_task                 # Final review and refinement based on SME feedback
-    ],
-    verbose=2
-)
-
-# Execute the Workflow with the Seed Abstract and Mission
-result = rsa_abstract_crew.kickoff(inputs={"abstract": seed_abstract, "mission": "Create a compelling RSA Conference abstract."})
-
-# Extract the individual components from the result
-final_title = result.get("title", "No title generated")
-final_abstract = result.get("abstract", "No abstract generated")
-final_session_details = result.get("refined_details", "No session details generated")
-
-# Create a consolidated final output
-final_output = (
-    f"### Final RSA Conference Submission\n\n"
-    f"**Session Title:** {final_title}\n\n"
-    f"**Abstract:**\n{final_abstract}\n\n"
-    f"**Session Details:**\n{final_session_details}\n"
-)
-
-# Save the final consolidated output to a log file
-output_file = save_output_to_log(final_output, log_dir="logs")
-print(f"Final Output saved to: {output_file}")
-
-# Print the final output for review
-print(final_output)
+DEFAULT_MISSION = "Create a compelling RSA Conference abstract."
+
+
+def build_crew(verbose=2, llm=None, task_callbacks=()):
+    """Builds an RSA abstract crew with its own agent and task instances."""
+    agents = build_agents(llm=llm)
+    tasks = build_tasks(*agents)
+    if task_callbacks:
+        def task_callback(output):
+            for callback in task_callbacks:
+                callback(output)
+        for task in tasks:
+            task.callback = task_callback
+    return Crew(
+        agents=list(agents),     # Title/abstract generator, detail writer, SME reviewer
+        tasks=tasks,
+        verbose=verbose
+    )
+
+
+def format_submission(result):
+    """Consolidates the crew result into the final submission text."""
+    if not isinstance(result, dict):
+        # crewai returns the last task's raw output, which holds the refined session details
+        result = {"refined_details": str(result)}
+    # Extract the individual components from the result
+    final_title = result.get("title", "No title generated")
+    final_abstract = result.get("abstract", "No abstract generated")
+    final_session_details = result.get("refined_details", "No session details generated")
+
+    # Create a consolidated final output
+    return (
+        f"### Final RSA Conference Submission\n\n"
+        f"**Session Title:** {final_title}\n\n"
+        f"**Abstract:**\n{final_abstract}\n\n"
+        f"**Session Details:**\n{final_session_details}\n"
+    )
+
+
+def submission_fields(outputs):
+    """Collects the fields format_submission reads (title, abstract, refined_details) from the task outputs.
+
+    Each output is searched for its spec's fields; without refined details,
+    as in a free-form run, the last task's whole output stands in for them.
+    """
+    result = {}
+    for number, spec in enumerate(TASK_SPECS, start=1):
+        result.update(extract_fields(outputs[number], list(spec.get("fields", {}))))
+    result.setdefault("refined_details", outputs[len(TASK_SPECS)])
+    return result
+
+
+def new_run_id():
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+
+def run_tasks(crew, inputs, checkpoints=None, run_id=None, fresh=False, tracer=None, router=None, task_log=None,
+              structured=False, on_start=None, on_reject=None):
+    """Runs the crew's tasks one at a time and returns the submission fields (see submission_fields).
+
+    Rather than handing each task the previous output whole, as crew.kickoff
+    does, each task gets only the upstream fields its spec reads, within its
+    token budget, followed by the seed (see context_budget).
+
+    With a CheckpointStore, a task whose key (run inputs, its context, task
+    text, agent config and model) is unchanged is served from its checkpoint.
+    The run manifest is saved after every task, so an interrupted run can be
+    resumed by its run_id.
+
+    With a CascadeRouter, each task tries its spec's model tiers in order and
+    escalates only when the output fails the spec's checks.
+
+    With `structured`, tasks whose spec declares "fields" answer with a
+    length-budgeted JSON object instead of free text (see structured_output).
+
+    If `task_log` is a list, a record of each finished task (name, output,
+    model, tier, seconds, reused) is appended to it, as a run store expects.
+
+    `on_start(name)` is called as each task begins, before it runs or is
+    restored from its checkpoint, and `on_reject(name, tier, problems)` when
+    the router discards a tier's output (e.g. StreamingLogHandler's
+    task_started and tier_rejected).
+    """
+    manifest = {"run_id": run_id or new_run_id(), "inputs": inputs, "status": "running", "tasks": []}
+
+    def save_manifest(**fields):
+        if checkpoints is not None:
+            manifest.update(fields)
+            checkpoints.save_run(manifest)
+
+    save_manifest()
+    if tracer is not None:
+        tracer.tasks = [(task_title(task.description), task.agent.role) for task in crew.tasks]
+
+    def attempt_for(spec):
+        return structured_output.execute_task if structured and spec.get("fields") else execute_task
+
+    def execute(name, task, context, spec):
+        """Runs a task; returns its output, the tier that produced it and that tier's model."""
+        if router is None:
+            return attempt_for(spec)(task, context, spec), None, task.agent.llm.model_name
+        output, tier = router.run(name, task, context, spec, attempt_for(spec), on_reject)
+        return output, tier, router.tiers[tier]
+
+    outputs = {}
+    try:
+        with tracer if tracer is not None else nullcontext():
+            for number, (task, spec) in enumerate(zip(crew.tasks, TASK_SPECS), start=1):
+                task.interpolate_inputs(inputs)
+                context = build_context(spec, outputs, inputs)
+                name = task_title(task.description)
+                if on_start is not None:
+                    on_start(name)
+                started = time.monotonic()
+                if checkpoints is None:
+                    outputs[number], tier, model = execute(name, task, context, spec)
+                    if task_log is not None:
+                        task_log.append({"task": name, "output": outputs[number], "model": model, "tier": tier,
+                                         "seconds": time.monotonic() - started, "reused": False})
+                    continue
+
+                fingerprint = task_fingerprint(task, task.agent)
+                if router is not None:
+                    fingerprint["tiers"] = router.policy(spec)
+                if attempt_for(spec) is not execute_task:
+                    fingerprint["fields"] = spec["fields"]
+                key = checkpoints.task_key(inputs, [content_hash(context)], fingerprint)
+                record = None if fresh else checkpoints.load(key)
+                reused = record is not None
+                if reused:
+                    # Executed tasks fire their callback themselves; replay it for reused ones
+                    if task.callback is not None:
+                        task.callback(record["output"])
+                else:
+                    output, tier, model = execute(name, task, context, spec)
+                    record = checkpoints.save(key, name, output, tier=tier, model=model)
+                outputs[number] = record["output"]
+                if task_log is not None:
+                    task_log.append({"task": name, "output": record["output"], "model": record.get("model"),
+                                     "tier": record.get("tier"), "seconds": time.monotonic() - started,
+                                     "reused": reused})
+                manifest["tasks"].append({"task": name, "key": key, "reused": reused})
+                save_manifest()
+    except BaseException as exc:
+        save_manifest(status="failed", error=repr(exc))
+        raise
+    save_manifest(status="complete")
+    return submission_fields(outputs)
+
+
+def run_crew(crew, inputs, checkpoints=None, run_id=None, fresh=False, tracer=None, cascade=True,
+             run_store=None, label=None, structured=False, on_start=None, on_reject=None):
+    """Runs the crew's tasks, formats the submission and appends the run, finished or failed, to `run_store`."""
+    router = CascadeRouter() if cascade else None
+    run_id = run_id or new_run_id()
+    task_log, started = [], time.time()
+    try:
+        result = run_tasks(crew, inputs, checkpoints, run_id, fresh, tracer, router, task_log, structured,
+                           on_start, on_reject)
+    except Exception as exc:
+        if run_store is not None:
+            run_store.record_run(run_id, inputs["abstract"], task_log, mission=inputs["mission"], started=started,
+                                 status="failed", error=repr(exc), label=label)
+        raise
+    final_output = format_submission(result)
+    if run_store is not None:
+        run_store.record_run(run_id, inputs["abstract"], task_log, submission=final_output,
+                             mission=inputs["mission"], started=started, label=label)
+    return final_output
+
+
+def run_submission(seed_abstract, mission=DEFAULT_MISSION, verbose=2, tracer=None,
+                   checkpoints=None, run_id=None, fresh=False, cascade=True, run_store=None, label=None,
+                   structured=False):
+    """Runs a fresh crew over one seed abstract and returns the final submission text.
+
+    With a CheckpointStore in `checkpoints`, tasks whose inputs are unchanged
+    are served from their checkpoints; `fresh` recomputes (and re-saves) them all.
+    `cascade` routes each task through its model tiers (see cascade.CascadeRouter).
+    With a RunStore in `run_store`, the run is recorded there under `run_id`.
+    `structured` asks for budgeted JSON fields instead of free text (see structured_output).
+    """
+    if tracer is None:
+        rsa_abstract_crew = build_crew(verbose=verbose)
+    else:
+        rsa_abstract_crew = build_crew(verbose=verbose, llm=build_llm(callbacks=[tracer]),
+                                       task_callbacks=[tracer.task_done])
+    inputs = {"abstract": seed_abstract, "mission": mission}
+    return run_crew(rsa_abstract_crew, inputs, checkpoints, run_id, fresh, tracer, cascade, run_store, label,
+                    structured)
+
+
+def run_submission_streaming(seed_abstract, mission=DEFAULT_MISSION, log_dir="logs", echo=True, tracer=None,
+                             checkpoints=None, run_id=None, fresh=False, cascade=True, run_store=None, label=None,
+                             structured=False):
+    """Runs a fresh crew while streaming each task's tokens to stdout and an append-only log.
+
+    Returns the final submission text, the stream log path and the per-task time-to-first-token.
+    """
+    log_file = stream_log_path(log_dir)
+    titles = [task_title(spec["description"]) for spec in TASK_SPECS]
+    handler = StreamingLogHandler(log_file, titles, echo=echo)
+    callbacks = [handler] if tracer is None else [handler, tracer]
+    try:
+        stream_llm = build_llm(streaming=True, callbacks=callbacks)
+        task_callbacks = [callback.task_done for callback in callbacks]
+        rsa_abstract_crew = build_crew(verbose=0, llm=stream_llm, task_callbacks=task_callbacks)
+        inputs = {"abstract": seed_abstract, "mission": mission}
+        final_output = run_crew(rsa_abstract_crew, inputs, checkpoints, run_id, fresh, tracer, cascade,
+                                run_store, label, structured, handler.task_started, handler.tier_rejected)
+        handler.write_section("Final RSA Conference Submission", final_output)
+    finally:
+        handler.close()
+    return final_output, log_file, handler.ttft
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate an RSA Conference submission from a seed abstract.")
+    parser.add_argument("--seed", default="rsac_seed.txt", help="Seed file to read (default: rsac_seed.txt).")
+    parser.add_argument("--mission", default=DEFAULT_MISSION, help="Mission passed to the crew.")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream tokens to the console and an append-only log as each task runs.")
+    parser.add_argument("--trace", action="store_true",
+                        help=f"Write per-task and per-call trace records to {DEFAULT_TRACE_DIR}/trace_<run>.jsonl.")
+    parser.add_argument("--trace-summary", action="store_true",
+                        help="Print a table of where the time went (implies --trace).")
+    parser.add_argument("--checkpoint-dir", default=DEFAULT_CHECKPOINT_DIR,
+                        help=f"Where per-task checkpoints and run manifests live (default: {DEFAULT_CHECKPOINT_DIR}).")
+    parser.add_argument("--resume", nargs="?", const="latest", metavar="RUN_ID",
+                        help="Continue an interrupted run (the latest one if RUN_ID is omitted) "
+                             "with its original seed and mission.")
+    parser.add_argument("--fresh", action="store_true",
+                        help="Recompute every task instead of reusing valid checkpoints.")
+    parser.add_argument("--no-checkpoints", action="store_true",
+                        help="Run without reading or writing checkpoints.")
+    parser.add_argument("--no-cascade", action="store_true",
+                        help="Run every task on its agent's model only, without validating and escalating.")
+    parser.add_argument("--structured", action="store_true",
+                        help="Have each task return length-budgeted JSON fields instead of free text.")
+    parser.add_argument("--store", default=None,
+                        help="Run store to record the run in (default: RUN_STORE_PATH or runs/runs.sqlite).")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.resume and args.no_checkpoints:
+        raise SystemExit("--resume needs checkpoints; drop --no-checkpoints.")
+
+    checkpoints = None if args.no_checkpoints else CheckpointStore(args.checkpoint_dir)
+    if args.resume:
+        # A resumed run keeps its id and inputs; its finished tasks are found by checkpoint key
+        try:
+            manifest = checkpoints.load_run(None if args.resume == "latest" else args.resume)
+        except FileNotFoundError as exc:
+            raise SystemExit(f"Nothing to resume: {exc}")
+        run_id = manifest["run_id"]
+        if manifest.get("status") == "complete":
+            raise SystemExit(f"Run {run_id} already finished; start a new run instead of resuming it.")
+        seed_abstract, mission = manifest["inputs"]["abstract"], manifest["inputs"]["mission"]
+        print(f"Resuming run {run_id} ({len(manifest['tasks'])} task(s) already done)")
+    else:
+        # Read the seed input from the seed file
+        run_id = new_run_id()
+        seed_abstract, mission = read_seed_file(args.seed), args.mission
+
+    tracer = RunTracer(DEFAULT_TRACE_DIR, run_id=run_id) if args.trace or args.trace_summary else None
+    run_store = RunStore(args.store) if args.store else get_run_store()
+    run_options = dict(tracer=tracer, checkpoints=checkpoints, run_id=run_id, fresh=args.fresh,
+                       cascade=not args.no_cascade, run_store=run_store, structured=args.structured)
+
+    # Execute the Workflow with the Seed Abstract and Mission
+    if args.stream:
+        final_output, stream_file, ttft = run_submission_streaming(seed_abstract, mission, **run_options)
+        print(f"\nStreamed log saved to: {stream_file}")
+        for title, seconds in ttft.items():
+            print(f"Time to first token for {title}: {seconds:.2f}s")
+    else:
+        final_output = run_submission(seed_abstract, mission, **run_options)
+
+    # The run, its per-task outputs and the final submission are in the run store
+    print(f"Run {run_id} saved to: {run_store.path} (python run_store.py show {run_id})")
+
+    # Print the final output for review
+    print(final_output)
+
+    # Report how many completions were served from the shared cache
+    completion_cache = get_completion_cache()
+    if completion_cache is not None:
+        print(f"LLM cache: {completion_cache.stats()}")
+
+    # Report which model tier produced each task's output, to tune the tier policy
+    if not args.no_cascade:
+        print(f"Model tiers:\n{format_stats(cascade_stats.stats())}")
+
+    if checkpoints is not None:
+        reused = [task["task"] for task in checkpoints.load_run(run_id)["tasks"] if task["reused"]]
+        print(f"Run {run_id}: reused checkpoints for {len(reused)} task(s){': ' + ', '.join(reused) if reused else ''}")
+
+    if tracer is not None:
+        print(f"Trace saved to: {tracer.path}")
+        if args.trace_summary:
+            print(format_summary(summarize(tracer.path)))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
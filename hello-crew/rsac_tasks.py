@@ -1,8 +1,15 @@
-from crewai import Task
-from personas import RSATitleAbstractGenerator, RSADetailWriter, SMEReviewer
+from registry import LazyRegistry
+
+# Task specs are plain data so the tasks can be listed without importing crewai.
+# "reads" maps earlier task numbers to the fields this task needs from them (None
+# for the whole output) and "context_tokens" caps their size; see context_budget.
+# "tiers" lists the model tiers to try in order and "checks" the validation an
+# output must pass before a later tier is skipped; see cascade. "fields" are the
+# output fields and their character limits in structured-output mode; see
+# structured_output. Their names are the keys format_submission reads.
 
 # Define the Combined Title and Abstract Generation Task
-generate_title_abstract_task = Task(
+TITLE_ABSTRACT_TASK = dict(
     description=(
         "### Task 1: Title and Abstract Generation\n"
         "1. **Title Generation**:\n"
@@ -26,11 +33,15 @@ generate_title_abstract_task = Task(
         "2. A concise 400-character abstract that clearly summarizes the session’s focus, key learning points, "
         "and the value proposition for the audience."
     ),
-    agent=RSATitleAbstractGenerator
+    reads={},
+    context_tokens=0,
+    tiers=("small", "large"),
+    checks=dict(max_chars={"title": 75, "abstract": 400}),
+    fields={"title": 75, "abstract": 400}
 )
 
 # Define the Session Details Task
-generate_session_details_task = Task(
+SESSION_DETAILS_TASK = dict(
     description=(
         "### Task 2: Session Detail Generation\n"
         "1. **Session Overview**:\n"
@@ -57,11 +68,15 @@ generate_session_details_task = Task(
         "real-world examples, and clear actionable takeaways.\n"
         "2. A structured description that effectively engages RSA attendees and provides relevant, actionable insights."
     ),
-    agent=RSADetailWriter
+    reads={1: ("title", "abstract")},
+    context_tokens=250,
+    tiers=("small", "large"),
+    checks=dict(max_chars={"output": 2500}, required=("problem", "solution", "case stud", "recommendation")),
+    fields={"details": 2500}
 )
 
 # Define the SME Review and Refinement Task
-review_refine_task = Task(
+REVIEW_REFINE_TASK = dict(
     description=(
         "### Task 3: SME Review and Refinement\n"
         "1. **Review for Technical Accuracy**:\n"
@@ -86,5 +101,41 @@ review_refine_task = Task(
         "2. Final refined session details that are polished, professional, and aligned with RSA themes, providing "
         "clear takeaways and interactive value for the target audience."
     ),
-    agent=SMEReviewer
+    reads={1: ("title",), 2: None},
+    context_tokens=800,
+    tiers=("small", "large"),
+    checks=dict(required=("case stud", "recommendation")),
+    fields={"feedback": 1000, "refined_details": 2500}
 )
+
+# Task specs in pipeline order
+TASK_SPECS = [TITLE_ABSTRACT_TASK, SESSION_DETAILS_TASK, REVIEW_REFINE_TASK]
+
+
+def task_fields(spec):
+    """Returns the spec fields crewai's Task accepts."""
+    return {key: spec[key] for key in ("description", "expected_output")}
+
+
+def build_tasks(title_abstract_agent, detail_writer_agent, sme_reviewer_agent):
+    """Builds a fresh set of RSA tasks bound to the given agents."""
+    from crewai import Task
+    return [
+        Task(**task_fields(TITLE_ABSTRACT_TASK), agent=title_abstract_agent),
+        Task(**task_fields(SESSION_DETAILS_TASK), agent=detail_writer_agent),
+        Task(**task_fields(REVIEW_REFINE_TASK), agent=sme_reviewer_agent),
+    ]
+
+
+def _build_default_tasks():
+    import personas
+    return build_tasks(personas.RSATitleAbstractGenerator, personas.RSADetailWriter, personas.SMEReviewer)
+
+
+# Register the default tasks for the module-level agents; they are built on first access
+_registry = LazyRegistry()
+_registry.register("default_tasks", _build_default_tasks)
+for _index, _name in enumerate(["generate_title_abstract_task", "generate_session_details_task", "review_refine_task"]):
+    _registry.register(_name, lambda index=_index: _registry.get("default_tasks")[index])
+
+__getattr__ = _registry.module_getattr(__name__)
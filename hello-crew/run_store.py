@@ -0,0 +1,288 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from datetime import datetime
+
+from util import sqlite_connection
+
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "runs", "runs.sqlite")
+
+
+def seed_hash(seed_abstract):
+    """SHA-256 of the seed text with surrounding whitespace stripped."""
+    return hashlib.sha256(seed_abstract.strip().encode("utf-8")).hexdigest()
+
+
+def _pack(text):
+    return zlib.compress(text.encode("utf-8"), 6) if text is not None else None
+
+
+def _unpack(blob):
+    return zlib.decompress(blob).decode("utf-8") if blob is not None else None
+
+
+class RunStore:
+    """Append-only store of pipeline runs, indexed by seed, time and model.
+
+    Runs live in a SQLite database in WAL mode, so several processes can
+    append at once while others query. Seeds are stored once per hash and
+    all texts are zlib-compressed, which keeps thousands of runs small. A
+    run is written in a single transaction; the only rewrite is a resumed
+    run, which replaces the failed attempt stored under the same run_id.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connection()
+        conn.executescript(
+            "CREATE TABLE IF NOT EXISTS seeds ("
+            " seed_hash TEXT PRIMARY KEY,"
+            " seed BLOB NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS runs ("
+            " run_id TEXT PRIMARY KEY,"
+            " seed_hash TEXT NOT NULL,"
+            " label TEXT,"
+            " mission TEXT,"
+            " status TEXT NOT NULL,"
+            " started REAL NOT NULL,"
+            " seconds REAL NOT NULL,"
+            " models TEXT NOT NULL,"
+            " submission BLOB,"
+            " error TEXT);"
+            "CREATE INDEX IF NOT EXISTS runs_seed_started ON runs (seed_hash, started);"
+            "CREATE INDEX IF NOT EXISTS runs_started ON runs (started);"
+            "CREATE TABLE IF NOT EXISTS run_tasks ("
+            " run_id TEXT NOT NULL,"
+            " position INTEGER NOT NULL,"
+            " task TEXT NOT NULL,"
+            " model TEXT,"
+            " tier TEXT,"
+            " seconds REAL,"
+            " reused INTEGER NOT NULL DEFAULT 0,"
+            " output BLOB,"
+            " PRIMARY KEY (run_id, position));"
+            "CREATE INDEX IF NOT EXISTS run_tasks_model ON run_tasks (model, run_id);"
+        )
+
+    def _connection(self):
+        return sqlite_connection(self._local, self.path)
+
+    def record_run(self, run_id, seed_abstract, tasks, submission=None, mission=None, started=None,
+                   status="complete", error=None, label=None):
+        """Appends one run.
+
+        `tasks` holds one dict per task in order, with "task" and "output" and
+        optionally "model", "tier", "seconds" and "reused". A failed run with
+        the same run_id, as left behind before a resume, is replaced; a
+        completed one raises ValueError.
+        """
+        started = started if started is not None else time.time()
+        digest = seed_hash(seed_abstract)
+        models = sorted({task["model"] for task in tasks if task.get("model")})
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("INSERT OR IGNORE INTO seeds (seed_hash, seed) VALUES (?, ?)", (digest, _pack(seed_abstract)))
+            previous = conn.execute("SELECT status FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+            if previous is not None:
+                if previous[0] == "complete":
+                    raise ValueError(f"Run {run_id} is already recorded as complete.")
+                conn.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+                conn.execute("DELETE FROM run_tasks WHERE run_id = ?", (run_id,))
+            conn.execute(
+                "INSERT INTO runs (run_id, seed_hash, label, mission, status, started, seconds, models, submission, error)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, digest, label, mission, status, started, time.time() - started, ",".join(models),
+                 _pack(submission), error),
+            )
+            conn.executemany(
+                "INSERT INTO run_tasks (run_id, position, task, model, tier, seconds, reused, output)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(run_id, position, task["task"], task.get("model"), task.get("tier"), task.get("seconds"),
+                  int(bool(task.get("reused"))), _pack(task.get("output")))
+                 for position, task in enumerate(tasks, start=1)],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return run_id
+
+    @staticmethod
+    def _summary(row):
+        run_id, digest, label, mission, status, started, seconds, models = row
+        return {"run_id": run_id, "seed_hash": digest, "label": label, "mission": mission, "status": status,
+                "started": started, "seconds": round(seconds, 3), "models": models.split(",") if models else []}
+
+    def runs(self, seed=None, digest=None, model=None, since=None, until=None, status=None, limit=50):
+        """Lists run summaries, newest first.
+
+        `seed` is a seed text and `digest` a seed hash; `model` keeps runs where
+        any task used that model; `since`/`until` are Unix timestamps.
+        """
+        clauses, params = [], []
+        if seed is not None:
+            digest = seed_hash(seed)
+        if digest is not None:
+            clauses.append("seed_hash = ?")
+            params.append(digest)
+        if model is not None:
+            clauses.append("run_id IN (SELECT run_id FROM run_tasks WHERE model = ?)")
+            params.append(model)
+        if since is not None:
+            clauses.append("started >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("started < ?")
+            params.append(until)
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._connection().execute(
+            "SELECT run_id, seed_hash, label, mission, status, started, seconds, models FROM runs"
+            f"{where} ORDER BY started DESC LIMIT ?", (*params, limit),
+        ).fetchall()
+        return [self._summary(row) for row in rows]
+
+    def get(self, run_id):
+        """Returns a run with its seed, submission and per-task outputs, or None."""
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT run_id, seed_hash, label, mission, status, started, seconds, models, submission, error"
+            " FROM runs WHERE run_id = ?", (run_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        run = self._summary(row[:8])
+        run["submission"], run["error"] = _unpack(row[8]), row[9]
+        run["seed"] = _unpack(conn.execute("SELECT seed FROM seeds WHERE seed_hash = ?", (run["seed_hash"],)).fetchone()[0])
+        run["tasks"] = [
+            {"task": task, "model": model, "tier": tier, "seconds": seconds, "reused": bool(reused),
+             "output": _unpack(output)}
+            for task, model, tier, seconds, reused, output in conn.execute(
+                "SELECT task, model, tier, seconds, reused, output FROM run_tasks WHERE run_id = ? ORDER BY position",
+                (run_id,),
+            )
+        ]
+        return run
+
+    def latest(self, seed, status="complete"):
+        """The most recent run for a seed text, with its outputs, or None."""
+        runs = self.runs(seed=seed, status=status, limit=1)
+        return self.get(runs[0]["run_id"]) if runs else None
+
+    def outputs(self, status="complete", after=0, through=None):
+        """Yields (run_id, name, text) for each task output and submission of the runs with `status`.
+
+        `after` and `through` bound the runs by their position in the store
+        (see version()), so a reader can pick up only the runs added since.
+        """
+        conn = self._connection()
+        through = self.version(status) if through is None else through
+        for run_id, submission in conn.execute(
+                "SELECT run_id, submission FROM runs WHERE status = ? AND rowid > ? AND rowid <= ? ORDER BY rowid",
+                (status, after, through)).fetchall():
+            for task, output in conn.execute(
+                    "SELECT task, output FROM run_tasks WHERE run_id = ? ORDER BY position", (run_id,)):
+                yield run_id, task, _unpack(output)
+            if submission is not None:
+                yield run_id, "submission", _unpack(submission)
+
+    def version(self, status="complete"):
+        """Position of the newest run with `status` (0 if none); grows whenever one is added.
+
+        Positions are SQLite rowids. Only failed rows are ever deleted, so a
+        run added later always gets a higher position than the completed runs
+        already there.
+        """
+        return self._connection().execute(
+            "SELECT COALESCE(MAX(rowid), 0) FROM runs WHERE status = ?", (status,)).fetchone()[0]
+
+    def stats(self):
+        conn = self._connection()
+        runs, seeds = conn.execute("SELECT COUNT(*), COUNT(DISTINCT seed_hash) FROM runs").fetchone()
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        return {"runs": runs, "seeds": seeds, "bytes": page_count * page_size, "path": self.path}
+
+
+_run_store = None
+_run_store_lock = threading.Lock()
+
+
+def get_run_store():
+    """Returns the process-wide run store; RUN_STORE_PATH overrides its location."""
+    global _run_store
+    with _run_store_lock:
+        if _run_store is None:
+            _run_store = RunStore(os.environ.get("RUN_STORE_PATH", DEFAULT_STORE_PATH))
+        return _run_store
+
+
+def _print_runs(runs):
+    for run in runs:
+        started = datetime.fromtimestamp(run["started"]).strftime("%Y-%m-%d %H:%M:%S")
+        label = f" [{run['label']}]" if run["label"] else ""
+        print(f"{run['run_id']}  {started}  {run['status']:<8} {run['seconds']:8.2f}s  "
+              f"seed {run['seed_hash'][:12]}{label}  {', '.join(run['models'])}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the run store.")
+    parser.add_argument("--store", default=os.environ.get("RUN_STORE_PATH", DEFAULT_STORE_PATH),
+                        help="Run store database (default: RUN_STORE_PATH or runs/runs.sqlite).")
+    commands = parser.add_subparsers(dest="command", required=True)
+    listing = commands.add_parser("list", help="List runs, newest first.")
+    listing.add_argument("--seed-file", help="Only runs for the seed in this file.")
+    listing.add_argument("--seed-hash", help="Only runs for this seed hash.")
+    listing.add_argument("--model", help="Only runs where a task used this model.")
+    listing.add_argument("--since", help="Only runs started at or after this ISO date/time.")
+    listing.add_argument("--status", help="Only runs with this status (complete or failed).")
+    listing.add_argument("--limit", type=int, default=20)
+    latest = commands.add_parser("latest", help="Print the latest submission for a seed.")
+    latest.add_argument("seed_file", help="Seed file whose latest run to show.")
+    latest.add_argument("--tasks", action="store_true", help="Also print every task's output.")
+    show = commands.add_parser("show", help="Print one run as JSON.")
+    show.add_argument("run_id")
+    commands.add_parser("stats", help="Show how many runs and seeds the store holds and its size.")
+    args = parser.parse_args(argv)
+
+    store = RunStore(args.store)
+    if args.command == "list":
+        from util import read_seed_file
+        seed = read_seed_file(args.seed_file) if args.seed_file else None
+        since = datetime.fromisoformat(args.since).timestamp() if args.since else None
+        _print_runs(store.runs(seed=seed, digest=args.seed_hash, model=args.model, since=since,
+                               status=args.status, limit=args.limit))
+    elif args.command == "latest":
+        from util import read_seed_file
+        run = store.latest(read_seed_file(args.seed_file))
+        if run is None:
+            print(f"No completed runs for the seed in {args.seed_file}.")
+            return 1
+        _print_runs([run])
+        if args.tasks:
+            for task in run["tasks"]:
+                print(f"\n## {task['task']} ({task['model'] or 'unknown model'})\n{task['output']}")
+        print(f"\n{run['submission']}")
+    elif args.command == "show":
+        run = store.get(args.run_id)
+        if run is None:
+            print(f"No run '{args.run_id}'.")
+            return 1
+        print(json.dumps(run, indent=2))
+    else:
+        for name, value in store.stats().items():
+            print(f"{name}: {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,70 @@
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+def topological_levels(dependencies):
+    """Groups task names into levels where every task depends only on earlier levels.
+
+    Tasks in the same level are independent of each other. Raises ValueError
+    for a dependency on an unknown task or a dependency cycle.
+    """
+    for name, depends_on in dependencies.items():
+        unknown = set(depends_on) - set(dependencies)
+        if unknown:
+            raise ValueError(f"Task '{name}' depends on unknown task(s): {', '.join(sorted(unknown))}")
+    levels, placed, remaining = [], set(), dict(dependencies)
+    while remaining:
+        level = [name for name, depends_on in remaining.items() if set(depends_on) <= placed]
+        if not level:
+            raise ValueError(f"Dependency cycle among tasks: {', '.join(sorted(remaining))}")
+        levels.append(level)
+        placed.update(level)
+        for name in level:
+            del remaining[name]
+    return levels
+
+
+def run_dag(tasks, dependencies, inputs=None, max_workers=None, on_start=None, on_done=None, context=None):
+    """Runs crewai tasks as soon as every task they depend on has finished.
+
+    `tasks` maps names to Task instances and `dependencies` maps names to the
+    names they depend on. Independent tasks run at the same time on a thread
+    pool; the fan-in into a task with several dependencies comes from its
+    crewai context (see tasks.build_tasks). Tasks that share an agent never
+    overlap, since an agent's executor is not thread-safe. `on_start(name)` and
+    `on_done(name, output)` are called on the worker thread running the task.
+    `context` maps task names to context text for tasks that have no crewai
+    context of their own, such as the seed for the first task.
+
+    Returns a dict mapping task names to their outputs.
+    """
+    levels = topological_levels(dependencies)
+    max_workers = max_workers or max(len(level) for level in levels)
+    agent_locks = {id(task.agent): threading.Lock() for task in tasks.values()}
+    outputs = {}
+
+    def run(name):
+        task = tasks[name]
+        with agent_locks[id(task.agent)]:
+            if on_start is not None:
+                on_start(name)
+            output = task.execute(context=(context or {}).get(name))
+            if on_done is not None:
+                on_done(name, output)
+        return output
+
+    if inputs:
+        for task in tasks.values():
+            task.interpolate_inputs(inputs)
+
+    pending, running = dict(dependencies), {}
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="dag") as pool:
+        while pending or running:
+            ready = [name for name, depends_on in pending.items() if all(d in outputs for d in depends_on)]
+            for name in ready:
+                del pending[name]
+                running[pool.submit(run, name)] = name
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                outputs[running.pop(future)] = future.result()
+    return outputs
@@ -0,0 +1,202 @@
+import asyncio
+import json
+import os
+import threading
+import time
+
+import tracing
+
+DEFAULT_REPLAY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "search_replay.json")
+
+# Sites the Researcher restricts its searches to; each one becomes its own query variant
+RESEARCH_SITES = ("scholar.google.com", "arxiv.org", "researchgate.net")
+DEFAULT_MAX_RESULTS = 5
+
+
+def query_variants(topic):
+    """Expands a research topic into the query variants searched concurrently."""
+    return [f"{topic} site:{site}" for site in RESEARCH_SITES]
+
+
+class DuckDuckGoBackend:
+    """Live web search through the duckduckgo_search package."""
+
+    name = "ddg"
+
+    def search(self, query, max_results):
+        from duckduckgo_search import ddg  # Imported lazily so offline backends never need it
+        return ddg(query, max_results=max_results) or []
+
+
+class ReplayBackend:
+    """Offline backend that serves recorded results from a JSON fixture.
+
+    The fixture maps query strings to result lists; a "*" entry, if present,
+    answers any query that was not recorded.
+    """
+
+    name = "replay"
+
+    def __init__(self, path=DEFAULT_REPLAY_FILE, latency=0.0):
+        self.path = path
+        self.latency = latency  # Simulated per-query latency in seconds, useful for benchmarks
+        with open(path, "r") as file:
+            self.recorded = json.load(file)
+
+    def search(self, query, max_results):
+        if self.latency:
+            time.sleep(self.latency)
+        return list(self.recorded.get(query, self.recorded.get("*", [])))[:max_results]
+
+
+class RecordingBackend:
+    """Wraps another backend and records every result so it can be replayed later."""
+
+    def __init__(self, backend, path):
+        self.backend = backend
+        self.path = path
+        self.name = f"record:{backend.name}"
+        self._lock = threading.Lock()
+
+    def search(self, query, max_results):
+        results = self.backend.search(query, max_results)
+        with self._lock:
+            recorded = {}
+            if os.path.exists(self.path):
+                with open(self.path, "r") as file:
+                    recorded = json.load(file)
+            recorded[query] = results
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "w") as file:
+                json.dump(recorded, file, indent=2)
+        return results
+
+
+class SearchClient:
+    """Runs search queries concurrently with a TTL cache and URL de-duplication."""
+
+    def __init__(self, backend, ttl=3600, max_concurrency=4):
+        self.backend = backend
+        self.ttl = ttl
+        self.max_concurrency = max_concurrency
+        self.hits = 0
+        self.misses = 0
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def _cached(self, key):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+            self._cache.pop(key, None)
+            self.misses += 1
+            return None
+
+    async def asearch(self, query, max_results=DEFAULT_MAX_RESULTS, semaphore=None):
+        """Searches one query, serving it from the cache while the entry is fresh."""
+        key = (self.backend.name, query, max_results)
+        results = self._cached(key)
+        if results is not None:
+            return results
+        if semaphore is None:
+            results = await asyncio.to_thread(self.backend.search, query, max_results)
+        else:
+            async with semaphore:
+                results = await asyncio.to_thread(self.backend.search, query, max_results)
+        with self._lock:
+            self._cache[key] = (time.monotonic() + self.ttl, results)
+        return results
+
+    async def asearch_many(self, queries, max_results=DEFAULT_MAX_RESULTS):
+        """Searches all queries concurrently and merges the hits, dropping repeated URLs."""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        batches = await asyncio.gather(*(self.asearch(query, max_results, semaphore) for query in queries))
+        merged, seen = [], set()
+        for results in batches:
+            for result in results:
+                url = result.get("href")
+                if url in seen:
+                    continue
+                seen.add(url)
+                merged.append(result)
+        return merged
+
+    def search_many(self, queries, max_results=DEFAULT_MAX_RESULTS):
+        """Synchronous wrapper around asearch_many for agent code."""
+        started = time.monotonic()
+        hits_before = self.hits
+        results = asyncio.run(self.asearch_many(queries, max_results))
+        tracing.emit("tool_call", tool="perform_search", queries=len(queries), results=len(results),
+                     cache_hits=self.hits - hits_before, duration=time.monotonic() - started)
+        return results
+
+    def stats(self):
+        return {"backend": self.backend.name, "hits": self.hits, "misses": self.misses}
+
+
+def build_backend(name=None):
+    """Builds the backend named by `name` or SEARCH_BACKEND (ddg or replay).
+
+    SEARCH_REPLAY_FILE points the replay backend at another fixture, and
+    SEARCH_RECORD_FILE records live results for later offline replay.
+    """
+    name = name or os.environ.get("SEARCH_BACKEND", "ddg")
+    if name == "ddg":
+        backend = DuckDuckGoBackend()
+    elif name == "replay":
+        backend = ReplayBackend(
+            path=os.environ.get("SEARCH_REPLAY_FILE", DEFAULT_REPLAY_FILE),
+            latency=float(os.environ.get("SEARCH_REPLAY_LATENCY", "0")),
+        )
+    else:
+        raise ValueError(f"Unknown search backend '{name}'. Use 'ddg' or 'replay'.")
+
+    record_file = os.environ.get("SEARCH_RECORD_FILE")
+    if record_file:
+        backend = RecordingBackend(backend, record_file)
+    return backend
+
+
+_search_client = None
+_search_client_lock = threading.Lock()
+
+
+def get_search_client():
+    """Returns the process-wide search client; SEARCH_TTL sets the cache TTL in seconds."""
+    global _search_client
+    with _search_client_lock:
+        if _search_client is None:
+            _search_client = SearchClient(build_backend(), ttl=float(os.environ.get("SEARCH_TTL", "3600")))
+        return _search_client
+
+
+def format_results(topic, results):
+    """Lays out search results as a numbered research summary for an agent."""
+    summary = f"Research Summary for Topic: {topic}\n\n"
+    for idx, result in enumerate(results):
+        summary += f"{idx + 1}. Title: {result['title']}\n"
+        summary += f"URL: {result['href']}\n"
+        summary += f"Snippet: {result.get('body', 'No snippet available')}\n\n"
+    return summary if results else f"No search results for: {topic}"
+
+
+def search_topic(topic, max_results=DEFAULT_MAX_RESULTS):
+    """Searches every query variant of `topic` concurrently and returns the merged results as text."""
+    return format_results(topic, get_search_client().search_many(query_variants(topic), max_results=max_results))
+
+
+def search_tools():
+    """The web search tool for agents, or none when WEB_SEARCH=0."""
+    if os.environ.get("WEB_SEARCH", "1") == "0":
+        return []
+    from langchain_core.tools import Tool
+    return [Tool(
+        name="perform_search",
+        func=search_topic,
+        description=(
+            "Searches the web for research on a topic, restricted to "
+            f"{', '.join(RESEARCH_SITES)}. Input is a topic; returns titles, URLs and snippets."
+        ),
+    )]
@@ -0,0 +1,517 @@
+"""Resident pipeline service: warm crews, a bounded job queue and streamed results.
+
+Every worker gets its own RSA crew and outline agents, built once at
+startup together with the LLM clients and the retrieval index, so a job
+pays only for model time. Jobs arrive over a local HTTP API or a file queue
+and run at most --workers at a time.
+
+HTTP API (JSON unless noted):
+  POST /jobs               {"seed": "...", "mission": "...", "pipeline": "rsac" | "outline", "structured": false,
+                            "stream": false}
+                           -> 202 {"id": ...}; add ?stream=1 to get the output streamed back instead
+  GET  /jobs/<id>          status, timings and, once finished, the result
+  GET  /jobs/<id>/stream   the job's output as plain text, as it is generated
+  GET  /metrics            queue depth, running and finished jobs, latency percentiles
+  GET  /health
+
+File queue (--queue-dir DIR): drop <name>.json job files holding the same
+fields into DIR/inbox. A service claims a file by moving it to DIR/running,
+streams the output to DIR/outbox/<name>.txt and writes the finished job to
+DIR/done/<name>.json, so several services can share one queue.
+
+Only jobs with a stream reader (?stream=1, "stream": true or a file-queue
+outbox) run on streaming LLM clients, since LangChain's streaming path skips
+the completion cache. Other jobs use the warm, cached clients, and
+GET /jobs/<id>/stream then yields each task's output as the task finishes.
+"""
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from context_budget import build_context
+from llm_client import derive_llm
+from rsac_pipeline import DEFAULT_MISSION, build_crew, new_run_id, run_crew
+from run_store import RunStore, get_run_store
+from streaming import StreamingLogHandler, task_title
+from util import percentile, send_json
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_LOG_DIR = os.path.join("logs", "service")
+PIPELINES = ("rsac", "outline")
+# Finished jobs kept for GET /jobs/<id>, and jobs per latency window in /metrics
+MAX_FINISHED_JOBS = 1000
+LATENCY_WINDOW = 500
+
+
+class ServiceBusyError(RuntimeError):
+    """Raised when the job queue is full."""
+
+
+class Job:
+    """One submission job; its streamed output can be read while it runs."""
+
+    def __init__(self, request, job_id=None, output_path=None, on_finish=None):
+        self.id = job_id or uuid.uuid4().hex[:12]
+        self.request = request
+        self.output_path = output_path or os.path.join(DEFAULT_LOG_DIR, f"{self.id}.txt")
+        self.on_finish = on_finish
+        self.status = "queued"
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.run_id = None
+        self.result = None
+        self.error = None
+        self._chunks = []
+        self._changed = threading.Condition()
+
+    def append(self, text):
+        with self._changed:
+            self._chunks.append(text)
+            self._changed.notify_all()
+
+    def finish(self, status, result=None, error=None):
+        with self._changed:
+            self.status, self.result, self.error = status, result, error
+            self.finished = time.time()
+            self._changed.notify_all()
+        if self.on_finish is not None:
+            self.on_finish(self)
+
+    @property
+    def done(self):
+        return self.status in ("complete", "failed")
+
+    def stream(self, timeout=1.0):
+        """Yields the output as it is generated, from the start, until the job finishes."""
+        position = 0
+        while True:
+            with self._changed:
+                while position == len(self._chunks) and not self.done:
+                    self._changed.wait(timeout)
+                chunks, position = self._chunks[position:], len(self._chunks)
+                done = self.done
+            if chunks:
+                yield "".join(chunks)
+            if done and position == len(self._chunks):
+                return
+
+    def as_dict(self):
+        record = {"id": self.id, "status": self.status, "pipeline": self.request["pipeline"], "run_id": self.run_id,
+                  "submitted": self.submitted, "started": self.started, "finished": self.finished}
+        if self.started is not None:
+            record["queue_seconds"] = round(self.started - self.submitted, 3)
+        if self.finished is not None:
+            record["run_seconds"] = round(self.finished - (self.started or self.finished), 3)
+        if self.done:
+            record.update(result=self.result, error=self.error)
+        return record
+
+
+class JobStream(StreamingLogHandler):
+    """StreamingLogHandler that also feeds the job's stream readers."""
+
+    def __init__(self, job, log_file, task_titles):
+        self.job = job
+        super().__init__(log_file, task_titles, echo=False)
+
+    def _write(self, text):
+        super()._write(text)
+        self.job.append(text)
+
+
+class _RsacWorker:
+    """A warm RSA crew; a streamed job swaps in streaming copies of its LLMs and restores them after."""
+
+    def __init__(self):
+        self.crew = build_crew(verbose=0)
+        self.titles = [task_title(task.description) for task in self.crew.tasks]
+
+    def run(self, job, stream, run_store):
+        agents = {id(task.agent): task.agent for task in self.crew.tasks}.values()
+        originals = {id(agent): agent.llm for agent in agents}
+        if job.request["stream"]:
+            for agent in agents:
+                agent.llm = derive_llm(agent.llm, streaming=True, callbacks=[*(agent.llm.callbacks or []), stream])
+        for task in self.crew.tasks:
+            task.callback = stream.task_done
+        try:
+            inputs = {"abstract": job.request["seed"], "mission": job.request["mission"]}
+            result = run_crew(self.crew, inputs, run_id=job.run_id, cascade=job.request["cascade"],
+                              run_store=run_store, label=job.id, structured=job.request["structured"],
+                              on_start=stream.task_started, on_reject=stream.tier_rejected)
+        finally:
+            for agent in agents:
+                agent.llm = originals[id(agent)]
+            for task in self.crew.tasks:
+                task.callback = None
+        stream.write_section("Final RSA Conference Submission", result)
+        return result
+
+
+class _OutlineWorker:
+    """Warm outline agents; each job gets fresh tasks, run by the DAG scheduler.
+
+    A streamed job swaps in streaming copies of the agents' LLMs, as
+    _RsacWorker does; tasks that run in parallel stream to separate sections.
+    """
+
+    def __init__(self):
+        from ai_security_agents import build_agent
+        from tasks import TASK_SPECS
+        self.agents = {spec["agent"]: build_agent(spec["agent"]) for spec in TASK_SPECS.values()}
+        self.titles = [task_title(spec["description"]) for spec in TASK_SPECS.values()]
+
+    def run(self, job, stream, run_store):
+        from scheduler import run_dag
+        from tasks import build_tasks, dependencies
+
+        started = time.time()
+        originals = {name: agent.llm for name, agent in self.agents.items()}
+        if job.request["stream"]:
+            for agent in self.agents.values():
+                agent.llm = derive_llm(agent.llm, streaming=True, callbacks=[*(agent.llm.callbacks or []), stream])
+        tasks = build_tasks(self.agents)
+        seed, mission = job.request["seed"], job.request["mission"]
+        # No outline description has a placeholder, so the seed reaches the root tasks as their context
+        inputs = {"abstract": seed, "topic": seed, "mission": mission}
+        root_context = build_context({}, {}, inputs)
+        context = {name: root_context for name, depends_on in dependencies().items() if not depends_on}
+        finished = []
+
+        def on_start(name):
+            stream.task_started(task_title(tasks[name].description))
+
+        def on_done(name, output):
+            finished.append({"task": name, "output": output, "model": tasks[name].agent.llm.model_name})
+            stream.task_done(output)
+
+        try:
+            outputs = run_dag(tasks, dependencies(), inputs=inputs, on_start=on_start, on_done=on_done,
+                              context=context)
+        finally:
+            for name, agent in self.agents.items():
+                agent.llm = originals[name]
+        result = outputs[list(tasks)[-1]]
+        run_store.record_run(job.run_id, seed, finished, submission=result, mission=mission, started=started,
+                             label=job.id)
+        return result
+
+
+class PipelineService:
+    """Runs jobs on `workers` threads, each with its own warm crew per pipeline."""
+
+    def __init__(self, workers=2, max_queue=100, run_store=None, log_dir=DEFAULT_LOG_DIR, pipelines=PIPELINES):
+        self.workers = workers
+        self.run_store = run_store or get_run_store()
+        self.log_dir = log_dir
+        self.pipelines = tuple(pipelines)
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._running = 0
+        self._counts = {"complete": 0, "failed": 0}
+        self._latencies = {name: deque(maxlen=LATENCY_WINDOW) for name in ("queue", "run", "total")}
+        self._warm = {name: queue.Queue() for name in self.pipelines}
+        self._threads = []
+
+    def warm_up(self, preload=False):
+        """Builds every worker's crews and the shared clients; `preload` also loads the models on the server."""
+        import ai_security_agents
+        import personas
+        from cascade import TIERS
+        from retrieval import get_retrieval_index, retrieval_tools
+
+        personas.get_llm()
+        ai_security_agents.get_llm()
+        if retrieval_tools():
+            get_retrieval_index()
+        factories = {"rsac": _RsacWorker, "outline": _OutlineWorker}
+        for name in self.pipelines:
+            for _ in range(self.workers):
+                self._warm[name].put(factories[name]())
+        if preload:
+            from autotune import Endpoint
+            from llm_client import DEFAULT_BASE_URL
+            for model in dict.fromkeys(TIERS.values()):
+                endpoint = Endpoint(os.environ.get("LLM_BASE_URL", DEFAULT_BASE_URL), model, max_tokens=1)
+                try:
+                    endpoint.complete("Hello")
+                finally:
+                    endpoint.close()
+
+    def start(self):
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def submit(self, request, job_id=None, output_path=None, on_finish=None, stream=False):
+        """Queues a job; raises ValueError for a bad request and ServiceBusyError when the queue is full.
+
+        `stream` (or "stream" in the request) streams the job's tokens as they are generated.
+        """
+        seed = (request.get("seed") or request.get("abstract") or "").strip()
+        if not seed:
+            raise ValueError("A job needs a 'seed' (or 'abstract').")
+        pipeline = request.get("pipeline", "rsac")
+        if pipeline not in self.pipelines:
+            raise ValueError(f"Unknown pipeline '{pipeline}'; this service runs {', '.join(self.pipelines)}.")
+        request = {"seed": seed, "mission": request.get("mission") or DEFAULT_MISSION, "pipeline": pipeline,
+                   "structured": bool(request.get("structured")), "cascade": request.get("cascade", True) is not False,
+                   "stream": stream or bool(request.get("stream"))}
+        job_id = job_id or uuid.uuid4().hex[:12]
+        job = Job(request, job_id, output_path or os.path.join(self.log_dir, f"{job_id}.txt"), on_finish)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            raise ServiceBusyError(f"{self._queue.maxsize} jobs are already queued.") from None
+        with self._lock:
+            self._jobs[job.id] = job
+            self._forget_finished()
+        return job
+
+    def _forget_finished(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                self._running += 1
+            job.status, job.started, job.run_id = "running", time.time(), new_run_id()
+            pipeline = job.request["pipeline"]
+            worker = self._warm[pipeline].get()
+            stream = None
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(job.output_path)), exist_ok=True)
+                stream = JobStream(job, job.output_path, worker.titles)
+                result = worker.run(job, stream, self.run_store)
+                status, error = "complete", None
+            except Exception as exc:
+                result, status, error = None, "failed", repr(exc)
+            finally:
+                self._warm[pipeline].put(worker)
+                if stream is not None:
+                    stream.close()
+            job.finish(status, result, error)
+            with self._lock:
+                self._running -= 1
+                self._counts[status] += 1
+                self._latencies["queue"].append(job.started - job.submitted)
+                self._latencies["run"].append(job.finished - job.started)
+                self._latencies["total"].append(job.finished - job.submitted)
+            self._queue.task_done()
+
+    def metrics(self):
+        from llm_cache import get_completion_cache
+        from llm_client import get_transport
+
+        with self._lock:
+            latencies = {name: list(values) for name, values in self._latencies.items()}
+            metrics = {"queued": self._queue.qsize(), "running": self._running, "workers": self.workers,
+                       "max_queue": self._queue.maxsize, **self._counts}
+        metrics["latency_seconds"] = {
+            name: {"p50": round(percentile(values, 0.5), 3), "p95": round(percentile(values, 0.95), 3),
+                   "max": round(max(values), 3), "jobs": len(values)} if values else None
+            for name, values in latencies.items()
+        }
+        completion_cache = get_completion_cache()
+        metrics["llm"] = get_transport().stats()
+        metrics["llm_cache"] = completion_cache.stats() if completion_cache is not None else None
+        return metrics
+
+
+class FileQueue:
+    """Feeds job files from an inbox directory to the service; see the module docstring for the layout."""
+
+    def __init__(self, root, service, poll_interval=0.5):
+        self.root = root
+        self.service = service
+        self.poll_interval = poll_interval
+        for name in ("inbox", "running", "outbox", "done"):
+            os.makedirs(os.path.join(root, name), exist_ok=True)
+
+    def _path(self, folder, name):
+        return os.path.join(self.root, folder, name)
+
+    def _finished(self, job):
+        name = job.id
+        record = job.as_dict()
+        tmp_path = self._path("done", f".{name}.json.tmp")
+        with open(tmp_path, "w") as file:
+            json.dump(record, file, indent=2)
+        os.replace(tmp_path, self._path("done", f"{name}.json"))
+        try:
+            os.remove(self._path("running", f"{name}.json"))
+        except FileNotFoundError:
+            pass
+
+    def poll(self):
+        """Claims and submits the inbox files, oldest first, while the service has room for them."""
+        waiting = []
+        for entry in os.scandir(self._path("inbox", "")):
+            if entry.name.endswith(".json"):
+                try:
+                    waiting.append((entry.stat().st_mtime, entry.name))
+                except FileNotFoundError:
+                    continue  # Claimed by another service meanwhile
+        for _, file_name in sorted(waiting):
+            if self.service._queue.full():
+                return
+            name = file_name[:-len(".json")]
+            try:
+                # The rename is the claim: only one service can move the file
+                os.replace(self._path("inbox", file_name), self._path("running", file_name))
+            except FileNotFoundError:
+                continue
+            try:
+                with open(self._path("running", file_name), "r") as file:
+                    request = json.load(file)
+                self.service.submit(request, job_id=name, output_path=self._path("outbox", f"{name}.txt"),
+                                    on_finish=self._finished, stream=True)
+            except (ValueError, ServiceBusyError) as exc:
+                job = Job({"pipeline": None}, job_id=name, on_finish=self._finished)
+                job.finish("failed", error=repr(exc))
+
+    def run(self):
+        while True:
+            try:
+                self.poll()
+            except OSError as exc:
+                print(f"File queue: {exc!r}")
+            time.sleep(self.poll_interval)
+
+    def start(self):
+        threading.Thread(target=self.run, name="file-queue", daemon=True).start()
+        return self
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # Keep the service console for job progress
+
+    def _send_json(self, status, payload):
+        send_json(self, status, payload)
+
+    def _send_stream(self, job):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("X-Job-Id", job.id)
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        try:
+            for text in job.stream():
+                self.wfile.write(text.encode("utf-8"))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client left; the job keeps running
+
+    def do_GET(self):
+        service = self.server.service
+        parts = [part for part in urlparse(self.path).path.split("/") if part]
+        if parts == ["health"]:
+            self._send_json(200, {"status": "ok"})
+        elif parts == ["metrics"]:
+            self._send_json(200, service.metrics())
+        elif len(parts) in (2, 3) and parts[0] == "jobs" and parts[2:] in ([], ["stream"]):
+            job = service.get(parts[1])
+            if job is None:
+                self._send_json(404, {"error": f"No job '{parts[1]}'."})
+            elif parts[2:] == ["stream"]:
+                self._send_stream(job)
+            else:
+                self._send_json(200, job.as_dict())
+        else:
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        service = self.server.service
+        url = urlparse(self.path)
+        if url.path.rstrip("/") != "/jobs":
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            stream = parse_qs(url.query).get("stream", ["0"])[0] not in ("0", "false", "")
+            job = service.submit(request, stream=stream)
+        except ValueError as exc:  # Includes malformed JSON
+            self._send_json(400, {"error": str(exc)})
+            return
+        except ServiceBusyError as exc:
+            self._send_json(503, {"error": str(exc)})
+            return
+        if stream:
+            self._send_stream(job)
+        else:
+            self._send_json(202, {"id": job.id, "status": job.status})
+
+
+def serve(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve pipeline jobs from warm crews over HTTP and/or a file queue.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"HTTP port (default: {DEFAULT_PORT}; 0 disables HTTP).")
+    parser.add_argument("--queue-dir", help="Also take jobs from JSON files in QUEUE_DIR/inbox.")
+    parser.add_argument("--workers", type=int, default=2, help="Jobs run at the same time (default: 2).")
+    parser.add_argument("--max-queue", type=int, default=100, help="Jobs waiting before submissions are refused.")
+    parser.add_argument("--pipeline", action="append", choices=PIPELINES,
+                        help="Pipeline to keep warm; repeatable (default: all).")
+    parser.add_argument("--log-dir", default=DEFAULT_LOG_DIR, help=f"Per-job output files (default: {DEFAULT_LOG_DIR}).")
+    parser.add_argument("--store", help="Run store for finished jobs (default: RUN_STORE_PATH or runs/runs.sqlite).")
+    parser.add_argument("--preload", action="store_true", help="Load every tier's model on the server at startup.")
+    args = parser.parse_args(argv)
+
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if not args.port and not args.queue_dir:
+        parser.error("nothing to serve: give a --port or a --queue-dir")
+
+    run_store = RunStore(args.store) if args.store else get_run_store()
+    service = PipelineService(args.workers, args.max_queue, run_store, args.log_dir, args.pipeline or PIPELINES)
+    started = time.monotonic()
+    service.warm_up(preload=args.preload)
+    service.start()
+    print(f"Warmed {args.workers} worker(s) for {', '.join(service.pipelines)} in {time.monotonic() - started:.1f}s")
+    if args.queue_dir:
+        FileQueue(args.queue_dir, service).start()
+        print(f"Watching {os.path.join(args.queue_dir, 'inbox')} for job files")
+    try:
+        if args.port:
+            server = serve(service, args.host, args.port)
+            print(f"Serving on http://{args.host}:{server.server_address[1]} (POST /jobs, GET /metrics)")
+            server.serve_forever()
+        else:
+            while True:
+                time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
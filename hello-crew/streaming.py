@@ -0,0 +1,135 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+def stream_log_path(log_dir="logs"):
+    """Returns a fresh path for a streamed run log in the given directory."""
+    os.makedirs(log_dir, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return os.path.join(log_dir, f"stream_log_{timestamp}_{os.getpid()}.txt")
+
+
+def task_title(description):
+    """Uses the first line of a task description (e.g. "Task 1: ...") as its section title."""
+    return description.strip().splitlines()[0].lstrip("# ").strip()
+
+
+class StreamingLogHandler(BaseCallbackHandler):
+    """Streams LLM tokens to stdout and an append-only log, one section per task.
+
+    task_started() opens a task's section when the task begins and
+    task_done(), its completion callback, closes it; time-to-first-token and
+    duration are measured from task_started(). Tokens go to the section of
+    the task running on the calling thread, so tasks run in parallel (see
+    scheduler.run_dag) keep separate sections: the oldest open section
+    streams live and later ones are held back until it closes. When the
+    model cascade discards a tier's output, tier_rejected() marks it in the
+    section, so the rejected text is not mistaken for the answer.
+    """
+
+    def __init__(self, log_file, task_titles, echo=True):
+        self.log_file = log_file
+        self.task_titles = list(task_titles)
+        self.echo = echo
+        self.ttft = {}
+        self.durations = {}
+        self._sections = OrderedDict()  # Open sections by title, oldest first
+        self._running = {}  # Thread id -> title of the task it runs
+        self._lock = threading.Lock()
+        self._file = open(log_file, "a", encoding="utf-8")
+
+    def _write(self, text):
+        self._file.write(text)
+        self._file.flush()  # Flush every write so a crash keeps everything streamed so far
+        if self.echo:
+            sys.stdout.write(text)
+            sys.stdout.flush()
+
+    def _current(self):
+        title = self._running.get(threading.get_ident())
+        return title, self._sections.get(title)
+
+    def _emit(self, section, text):
+        if section is None or section is next(iter(self._sections.values())):
+            self._write(text)
+        else:
+            section["held"].append(text)
+
+    def _flush(self):
+        """Writes what the oldest open sections held back, dropping those that are finished."""
+        while self._sections:
+            title, section = next(iter(self._sections.items()))
+            self._write("".join(section["held"]))
+            section["held"] = []
+            if not section["done"]:
+                break
+            del self._sections[title]
+
+    def task_started(self, title):
+        """Opens the section for a task that is about to run on this thread."""
+        with self._lock:
+            self._running[threading.get_ident()] = title
+            section = self._sections[title] = {"started": time.monotonic(), "tokens": 0, "held": [], "done": False}
+            self._emit(section, f"\n\n## {title}\n\n")
+
+    def on_llm_new_token(self, token, **kwargs):
+        with self._lock:
+            title, section = self._current()
+            if section is not None:
+                if title not in self.ttft:
+                    self.ttft[title] = time.monotonic() - section["started"]
+                section["tokens"] += 1
+            self._emit(section, token)
+
+    def tier_rejected(self, name, tier, problems):
+        """Cascade callback: marks the output streamed so far as discarded before the next tier runs."""
+        with self._lock:
+            _, section = self._current()
+            self._emit(section, f"\n\n[{tier} tier output rejected: {'; '.join(problems)}. "
+                                f"Retrying on the next tier.]\n\n")
+            if section is not None:
+                section["tokens"] = 0
+
+    def task_done(self, output):
+        """Task callback: closes the section of the task running on this thread."""
+        with self._lock:
+            title, section = self._current()
+            self._running.pop(threading.get_ident(), None)
+            if section is None:
+                self._write(str(getattr(output, "raw_output", output)))
+                return
+            self.durations[title] = time.monotonic() - section["started"]
+            if section["tokens"] == 0:
+                # Nothing was streamed (e.g. a cached completion), so record the final output instead
+                self._emit(section, str(getattr(output, "raw_output", output)))
+            section["done"] = True
+            self._flush()
+
+    def write_section(self, title, text):
+        """Appends a complete section, e.g. the consolidated submission."""
+        with self._lock:
+            self._write(f"\n\n## {title}\n\n{text}")
+
+    def close(self):
+        """Writes anything still held back and the per-task timing summary, then closes the log."""
+        with self._lock:
+            for section in self._sections.values():
+                self._write("".join(section["held"]))
+            self._sections.clear()
+            lines = ["\n\n## Timings\n"]
+            for title in self.task_titles:
+                ttft = self.ttft.get(title)
+                duration = self.durations.get(title)
+                lines.append(
+                    f"- {title}: time to first token "
+                    f"{'n/a' if ttft is None else f'{ttft:.2f}s'}, total "
+                    f"{'n/a' if duration is None else f'{duration:.2f}s'}\n"
+                )
+            self._write("".join(lines))
+            self._file.close()
@@ -0,0 +1,82 @@
+"""Structured-output mode: each task answers with a JSON object of length-limited fields.
+
+A task spec declares its output fields and their character limits
+("fields"). Instead of crewai's ReAct loop, whose "Thought:" preamble and
+free-form answer are mostly thrown away, the agent's model is asked once for
+a JSON object holding just those fields, with max_tokens sized from the
+limits, the server's JSON response format (grammar-constrained on Ollama)
+and stop sequences that end the reply once the object is closed.
+"""
+import json
+import math
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from context_budget import CHARS_PER_TOKEN, extract_fields
+from llm_client import derive_llm
+
+# Tokens for the key, quotes and separators around each field, and for the braces
+FIELD_OVERHEAD_TOKENS = 8
+OBJECT_OVERHEAD_TOKENS = 8
+# Headroom over the limits, so a slightly long field fails validation instead of being cut mid-sentence
+BUDGET_SLACK = 1.25
+# A closed object followed by a blank line is finished; what comes after is commentary
+STOP_SEQUENCES = ["}\n\n"]
+JSON_RESPONSE_FORMAT = {"type": "json_object"}
+
+
+def token_budget(fields, slack=BUDGET_SLACK):
+    """max_tokens for a JSON object holding `fields` ({name: character limit})."""
+    tokens = sum(math.ceil(limit / CHARS_PER_TOKEN) + FIELD_OVERHEAD_TOKENS for limit in fields.values())
+    return math.ceil((tokens + OBJECT_OVERHEAD_TOKENS) * slack)
+
+
+def output_instructions(fields):
+    keys = ", ".join(f'"{name}" (at most {limit} characters)' for name, limit in fields.items())
+    return f"Respond with only a JSON object whose string fields are {keys}. Write nothing before or after it."
+
+
+def parse_output(text, fields):
+    """Returns {field: value} from a model reply.
+
+    The reply should be a JSON object, but one cut off by max_tokens or a
+    stop sequence is closed first, and labelled text ("Title: ...") is
+    accepted too. Text with no recognisable fields becomes the last field.
+    """
+    text = text.split("Final Answer:")[-1].strip()
+    for suffix in ("", "}", '"}'):
+        found = extract_fields(text + suffix, list(fields))
+        if found:
+            break
+    if not found and text:
+        found = {list(fields)[-1]: text}
+    return {field: found[field].strip() for field in fields if field in found}
+
+
+def render_output(values):
+    return json.dumps(values, ensure_ascii=False, indent=2)
+
+
+def execute_task(task, context, spec):
+    """Runs one task in structured mode on its agent's current LLM; returns the output as JSON text.
+
+    Like crewai's Task.execute, it sets task.output and fires task.callback.
+    """
+    from crewai.tasks.task_output import TaskOutput
+
+    fields = spec["fields"]
+    agent = task.agent
+    llm = derive_llm(agent.llm, max_tokens=token_budget(fields),
+                     model_kwargs={**agent.llm.model_kwargs, "response_format": JSON_RESPONSE_FORMAT})
+    messages = [
+        SystemMessage(content=f"You are {agent.role}. {agent.backstory}\nYour personal goal is: {agent.goal}"),
+        HumanMessage(content=f"{task.description}\n\n{output_instructions(fields)}\n\n"
+                             f"This is the context you're working with:\n{context}"),
+    ]
+    reply = llm.invoke(messages, stop=STOP_SEQUENCES).content
+    output = render_output(parse_output(reply, fields))
+    task.output = TaskOutput(description=task.description, exported_output=output, raw_output=output,
+                             agent=agent.role)
+    if task.callback is not None:
+        task.callback(task.output)
+    return output
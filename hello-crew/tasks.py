@@ -1,67 +1,128 @@
-from crewai import Task
-from personas import TopicParser, RSAResearcher, RSAOutliner, SME1, SME2
+from registry import LazyRegistry
+
+# Task specs are plain data so the tasks can be listed without importing crewai.
+# "agent" names an agent from ai_security_agents; "depends_on" names the tasks
+# whose outputs the task reads, so tasks that share no path can run at once.
 
 # Define the initial Topic Parsing task
-parse_topic_task = Task(
+PARSE_TOPIC_TASK = dict(
     description=(
         "1. Analyze the seed abstract and extract key topics, focus areas, and main messages.\n"
         "2. Provide a structured output that includes topics, focus areas, and primary themes."
     ),
     expected_output="A structured list of topics, focus areas, and key messages from the abstract.",
-    agent=TopicParser
+    agent="topic_parser",
+    depends_on=[]
 )
 
 # Define the initial research task based on extracted topics
-generate_research_summary_task = Task(
+GENERATE_RESEARCH_SUMMARY_TASK = dict(
     description=(
         "1. Use the parsed topics to conduct focused research on the provided topic.\n"
         "2. Summarize the key points, findings, and challenges in the research.\n"
         "3. Create a structured research summary that includes main findings and implications for RSA."
     ),
     expected_output="A detailed research summary covering the main findings and challenges of the topic.",
-    agent=RSAResearcher
+    agent="researcher",
+    depends_on=["parse_topic_task"]
 )
 
 # Define the outline generation task based on research
-generate_outline_task = Task(
+GENERATE_OUTLINE_TASK = dict(
     description=(
         "1. Create an initial outline based on the research summary.\n"
         "2. Ensure that the outline includes key sections and logical flow.\n"
         "3. Highlight the areas where SME feedback is required."
     ),
     expected_output="An initial structured outline covering all key research areas.",
-    agent=RSAOutliner
+    agent="outliner",
+    depends_on=["generate_research_summary_task"]
 )
 
 # Define the SME 1 review task
-sme_review_1_task = Task(
+SME_REVIEW_1_TASK = dict(
     description=(
         "1. Review the initial outline for technical accuracy and completeness.\n"
         "2. Provide insights on potential gaps or areas that need refinement.\n"
         "3. Ensure the outline aligns with research goals and mission context."
     ),
     expected_output="Annotated outline with technical feedback and suggestions.",
-    agent=SME1
+    agent="sme_1",
+    depends_on=["generate_outline_task"]
 )
 
 # Define the SME 2 review task
-sme_review_2_task = Task(
+SME_REVIEW_2_TASK = dict(
     description=(
-        "1. Review the refined outline incorporating SME 1 feedback.\n"
+        "1. Review the initial outline from a cybersecurity risk perspective.\n"
         "2. Add additional context or risk analysis perspectives where needed.\n"
         "3. Ensure that the outline covers all potential risks and mitigation strategies."
     ),
-    expected_output="Final outline with cybersecurity risk analysis and SME 2 inputs.",
-    agent=SME2
+    expected_output="Annotated outline with cybersecurity risk analysis and SME 2 inputs.",
+    agent="sme_2",
+    depends_on=["generate_outline_task"]
 )
 
 # Define the outline refinement task
-refine_outline_task = Task(
+REFINE_OUTLINE_TASK = dict(
     description=(
         "1. Refine the outline based on the feedback from SME 1 and SME 2.\n"
         "2. Adjust the structure to include all key points, supporting ideas, and details.\n"
         "3. Ensure that the hierarchical structure (I, A, i, (a), 1…) is followed."
     ),
     expected_output="A comprehensive outline with a hierarchical structure that incorporates all inputs.",
-    agent=RSAOutliner
+    agent="outliner",
+    depends_on=["sme_review_1_task", "sme_review_2_task"]
+)
+
+# Task specs in a valid sequential order
+TASK_SPECS = dict(
+    parse_topic_task=PARSE_TOPIC_TASK,
+    generate_research_summary_task=GENERATE_RESEARCH_SUMMARY_TASK,
+    generate_outline_task=GENERATE_OUTLINE_TASK,
+    sme_review_1_task=SME_REVIEW_1_TASK,
+    sme_review_2_task=SME_REVIEW_2_TASK,
+    refine_outline_task=REFINE_OUTLINE_TASK,
 )
+
+
+def dependencies():
+    """Maps each task name to the names of the tasks it depends on."""
+    return {name: list(spec["depends_on"]) for name, spec in TASK_SPECS.items()}
+
+
+def build_tasks(agents=None):
+    """Builds a fresh set of outline tasks, keyed by task name.
+
+    `agents` maps agent names to instances; agents that are missing are
+    built fresh, and an agent shared by several tasks is built only once.
+    Each task's crewai context is its depends_on tasks, so a task with
+    several dependencies receives all of their outputs in either scheduler.
+    """
+    from crewai import Task
+    from ai_security_agents import build_agent
+    agents = dict(agents or {})
+    tasks = {}
+    for name, spec in TASK_SPECS.items():
+        if spec["agent"] not in agents:
+            agents[spec["agent"]] = build_agent(spec["agent"])
+        fields = {key: value for key, value in spec.items() if key != "depends_on"}
+        if spec["depends_on"]:
+            fields["context"] = [tasks[dependency] for dependency in spec["depends_on"]]
+        tasks[name] = Task(**{**fields, "agent": agents[spec["agent"]]})
+    return tasks
+
+
+def _build_default_tasks():
+    import ai_security_agents
+    return build_tasks({spec["agent"]: getattr(ai_security_agents, spec["agent"]) for spec in TASK_SPECS.values()})
+
+
+# Register the default tasks for the module-level agents; they are built on first access
+_registry = LazyRegistry()
+_registry.register("default_tasks", _build_default_tasks)
+for _name in TASK_SPECS:
+    _registry.register(_name, lambda name=_name: _registry.get("default_tasks")[name])
+
+__getattr__ = _registry.module_getattr(__name__)
+
@@ -0,0 +1,39 @@
+import pytest
+
+from checkpoints import CheckpointStore
+from run_store import RunStore
+
+SEED = "Community-driven defense for AI systems."
+
+
+def test_resumed_run_replaces_its_failed_attempt(tmp_path):
+    store = RunStore(str(tmp_path / "runs.sqlite"))
+    store.record_run("run-1", SEED, [{"task": "Task 1", "output": "draft"}], status="failed", error="boom")
+
+    tasks = [{"task": "Task 1", "output": "draft", "reused": True}, {"task": "Task 2", "output": "details"}]
+    store.record_run("run-1", SEED, tasks, submission="final")
+
+    run = store.get("run-1")
+    assert run["status"] == "complete"
+    assert run["submission"] == "final"
+    assert [task["task"] for task in run["tasks"]] == ["Task 1", "Task 2"]
+    assert store.stats()["runs"] == 1
+
+
+def test_completed_run_is_not_recorded_twice(tmp_path):
+    store = RunStore(str(tmp_path / "runs.sqlite"))
+    store.record_run("run-1", SEED, [], submission="final")
+    with pytest.raises(ValueError, match="already recorded"):
+        store.record_run("run-1", SEED, [], submission="again")
+    assert store.get("run-1")["submission"] == "final"
+
+
+def test_resume_picks_the_latest_unfinished_run(tmp_path):
+    checkpoints = CheckpointStore(str(tmp_path / "checkpoints"))
+    checkpoints.save_run({"run_id": "interrupted", "status": "failed", "tasks": []})
+    checkpoints.save_run({"run_id": "finished", "status": "complete", "tasks": []})
+    assert checkpoints.load_run()["run_id"] == "interrupted"
+
+    checkpoints.save_run({"run_id": "interrupted", "status": "complete", "tasks": []})
+    with pytest.raises(FileNotFoundError):
+        checkpoints.load_run()
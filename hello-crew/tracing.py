@@ -0,0 +1,207 @@
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+DEFAULT_TRACE_DIR = "traces"
+
+# The tracer of the run executing on this thread; crews run their tasks on one thread
+_local = threading.local()
+
+
+def emit(kind, **fields):
+    """Reports an event (cache lookup, retry, tool call) to the tracer of the current thread, if any."""
+    tracer = getattr(_local, "tracer", None)
+    if tracer is not None:
+        tracer.event(kind, **fields)
+
+
+class TraceWriter:
+    """Appends JSON records to a file from a background thread.
+
+    write() only enqueues the record, so tracing costs the hot path a
+    queue put; serialization and file I/O happen on the writer thread.
+    """
+
+    _STOP = object()
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, record):
+        self._queue.put(record)
+
+    def _run(self):
+        with open(self.path, "a", encoding="utf-8") as file:
+            while True:
+                record = self._queue.get()
+                if record is self._STOP:
+                    break
+                file.write(json.dumps(record, default=str) + "\n")
+                if self._queue.empty():
+                    file.flush()
+
+    def close(self):
+        self._queue.put(self._STOP)
+        self._thread.join()
+
+
+class RunTracer(BaseCallbackHandler):
+    """Records one crew run as JSONL: a record per task, per LLM call and per tool call.
+
+    Attach it as a callback on the crew's LLM and call task_done() from every
+    task's callback. The crew runs tasks in order, so each task starts when
+    the previous one finishes. Tool calls are reported by the tools
+    themselves through emit(), since crewai sends tool callbacks to the
+    agent executor rather than to the LLM.
+    """
+
+    def __init__(self, trace_dir=DEFAULT_TRACE_DIR, run_id=None, tasks=()):
+        # (task name, agent role) pairs in execution order; may be set after the crew is built
+        self.tasks = list(tasks)
+        self.run_id = run_id or f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        self.path = os.path.join(trace_dir, f"trace_{self.run_id}.jsonl")
+        self._writer = TraceWriter(self.path)
+        self._index = 0
+        self._task_started = None
+        self._task_counts = None
+        self._calls = {}
+        self._current_call = None
+
+    @property
+    def _task(self):
+        return self.tasks[min(self._index, len(self.tasks) - 1)]
+
+    def _record(self, kind, **fields):
+        name, role = self._task
+        self._writer.write({"run_id": self.run_id, "kind": kind, "task": name, "agent": role, **fields})
+
+    def __enter__(self):
+        _local.tracer = self
+        self._task_started = time.time()
+        self._task_counts = defaultdict(int)
+        self._writer.write({"run_id": self.run_id, "kind": "run_start", "start": self._task_started})
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        _local.tracer = None
+        self._writer.write({"run_id": self.run_id, "kind": "run_end", "end": time.time(),
+                            "error": None if exc is None else repr(exc)})
+        self._writer.close()
+
+    def task_done(self, output=None):
+        """Task callback: writes the finished task's record and starts timing the next one."""
+        now = time.time()
+        self._record("task", start=self._task_started, end=now, duration=now - self._task_started,
+                     **self._task_counts)
+        self._index += 1
+        self._task_started = now
+        self._task_counts = defaultdict(int)
+
+    def event(self, kind, **fields):
+        """Folds cache and retry events into the running LLM call; writes everything else as a record."""
+        call = self._current_call
+        if kind == "cache_lookup" and call is not None:
+            call["cache_hit"] = fields.get("hit", False)
+        elif kind == "retry" and call is not None:
+            call["retries"] += 1
+        else:
+            self._task_counts[f"{kind}s"] += 1
+            self._record(kind, time=time.time(), **fields)
+
+    def _start_call(self, run_id, kwargs):
+        params = kwargs.get("invocation_params") or {}
+        self._current_call = self._calls[run_id] = {
+            "start": time.time(),
+            "model": params.get("model") or params.get("model_name"),
+            "cache_hit": False,
+            "retries": 0,
+        }
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start_call(run_id, kwargs)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start_call(run_id, kwargs)
+
+    def _end_call(self, run_id, **fields):
+        call = self._calls.pop(run_id, None)
+        if call is None:
+            return
+        self._current_call = None
+        end = time.time()
+        self._task_counts["llm_calls"] += 1
+        self._task_counts["cache_hits"] += int(call["cache_hit"])
+        self._task_counts["retries"] += call["retries"]
+        self._record("llm_call", end=end, duration=end - call["start"], **call, **fields)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        self._end_call(run_id, prompt_tokens=usage.get("prompt_tokens"),
+                       completion_tokens=usage.get("completion_tokens"))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end_call(run_id, error=repr(error))
+
+
+def summarize(path):
+    """Aggregates a trace file into per-task rows: time, LLM time, calls, tokens, cache hits, retries."""
+    rows = {}
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            record = json.loads(line)
+            if record["kind"] not in ("task", "llm_call", "tool_call"):
+                continue
+            row = rows.setdefault(record["task"], {
+                "agent": record["agent"], "seconds": 0.0, "llm_seconds": 0.0, "llm_calls": 0,
+                "prompt_tokens": 0, "completion_tokens": 0, "cache_hits": 0, "retries": 0, "tool_calls": 0,
+            })
+            if record["kind"] == "task":
+                row["seconds"] += record["duration"]
+            elif record["kind"] == "llm_call":
+                row["llm_calls"] += 1
+                row["llm_seconds"] += record["duration"]
+                row["prompt_tokens"] += record.get("prompt_tokens") or 0
+                row["completion_tokens"] += record.get("completion_tokens") or 0
+                row["cache_hits"] += int(record.get("cache_hit", False))
+                row["retries"] += record.get("retries", 0)
+            else:
+                row["tool_calls"] += 1
+    return rows
+
+
+def format_summary(rows):
+    """Renders summarize() output as a plain-text table, slowest task first."""
+    total = sum(row["seconds"] for row in rows.values()) or 1.0
+    lines = [f"{'task':<45} {'agent':<32} {'time':>8} {'share':>6} {'llm':>8} {'calls':>5} "
+             f"{'prompt':>7} {'compl':>6} {'hits':>4} {'retry':>5} {'tools':>5}"]
+    for name, row in sorted(rows.items(), key=lambda item: item[1]["seconds"], reverse=True):
+        lines.append(
+            f"{name[:45]:<45} {row['agent'][:32]:<32} {row['seconds']:7.2f}s {row['seconds'] / total:6.1%} "
+            f"{row['llm_seconds']:7.2f}s {row['llm_calls']:5d} {row['prompt_tokens']:7d} "
+            f"{row['completion_tokens']:6d} {row['cache_hits']:4d} {row['retries']:5d} {row['tool_calls']:5d}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize a JSONL run trace.")
+    parser.add_argument("trace", help="Trace file written by a traced run.")
+    args = parser.parse_args(argv)
+    print(format_summary(summarize(args.trace)))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
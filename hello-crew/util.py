@@ -1,5 +1,8 @@
+import hashlib
+import json
+import math
 import os
-from datetime import datetime
+import sqlite3
 
 def read_seed_file(file_path="seed.txt"):
     """Reads the seed file and returns the content."""
@@ -9,13 +12,38 @@ def read_seed_file(file_path="seed.txt"):
     else:
         raise FileNotFoundError(f"Seed file '{file_path}' not found.")
 
-def save_output_to_log(output, log_dir="logs"):
-    """Saves the given output to a timestamped .txt file in the specified directory."""
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)  # Create logs directory if not exists
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    log_file = os.path.join(log_dir, f"output_log_{timestamp}.txt")
-    with open(log_file, "w") as file:
-        file.write(output)
-    print(f"Output saved to: {log_file}")
-    return log_file
+
+def content_hash(value):
+    """SHA-256 of a JSON-serializable value, with keys sorted so equal values hash equally."""
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of `values`, e.g. fraction=0.95 for p95."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+def sqlite_connection(local, path):
+    """Returns this thread's connection to `path`, kept on the threading.local `local`.
+
+    sqlite3 connections must not cross threads. Connections run in
+    autocommit mode with WAL, so readers never block the writer.
+    """
+    conn = getattr(local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        local.conn = conn
+    return conn
+
+
+def send_json(handler, status, payload):
+    """Writes `payload` as a JSON response from a BaseHTTPRequestHandler."""
+    body = json.dumps(payload).encode("utf-8")
+    handler.send_response(status)
+    handler.send_header("Content-Type", "application/json")
+    handler.send_header("Content-Length", str(len(body)))
+    handler.end_headers()
+    handler.wfile.write(body)